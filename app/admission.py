@@ -0,0 +1,221 @@
+import asyncio
+import hmac
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple, Collection, Mapping
+
+# Token cost charged per request. Image OCR is far more expensive than text
+# analysis or chat; routes missing from this table are not rate limited.
+# "{name}" segments match any single path segment.
+ROUTE_COSTS: Dict[str, float] = {
+    "/analyze-prescription": float(os.getenv('COST_ANALYZE_PRESCRIPTION', '10')),
+    "/analyze-text": float(os.getenv('COST_ANALYZE_TEXT', '2')),
+    # Base charge; the handler adds the /analyze-text cost scaled by the share of changed lines
+    "/analyze-text/incremental": float(os.getenv('COST_ANALYZE_TEXT_INCREMENTAL', '1')),
+    "/extract-drug-info": float(os.getenv('COST_EXTRACT_DRUG_INFO', '1')),
+    "/granite-chat": float(os.getenv('COST_GRANITE_CHAT', '0.5')),
+    # Admin routes (also access-checked): allocation snapshots, engine imports and model loads
+    "/admin/memory": float(os.getenv('COST_ADMIN_MEMORY', '5')),
+    "/warmup": float(os.getenv('COST_WARMUP', '10')),
+    "/models/{name}/load": float(os.getenv('COST_MODEL_LOAD', '20')),
+}
+_ROUTE_TEMPLATES = [(route.split("/"), cost) for route, cost in ROUTE_COSTS.items() if "{" in route]
+
+LOOPBACK = frozenset({"127.0.0.1", "::1"})
+
+LANES = ("interactive", "batch")
+
+
+class TokenBucket:
+    """Classic token bucket: `capacity` burst, refilled at `rate` tokens per second"""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self, cost: float) -> float:
+        """Charge `cost` tokens; return 0 on success or seconds until it would succeed"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        if self.rate <= 0:
+            return float("inf")
+        return (cost - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """Per-client token buckets plus priority lanes with bounded concurrency
+
+    Interactive requests wait briefly for a free slot; batch requests are shed
+    immediately when their lane is full, so batch spikes cannot starve
+    interactive users.
+    """
+
+    def __init__(self, capacity: float, refill_rate: float, interactive_slots: int, batch_slots: int,
+                 queue_timeout: float, max_clients: int = 10000):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.queue_timeout = queue_timeout
+        self.max_clients = max_clients
+        self.slots = {"interactive": interactive_slots, "batch": batch_slots}
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._bucket_lock = threading.Lock()
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.in_flight = {lane: 0 for lane in LANES}
+        self.counters = {"admitted": 0, "rate_limited": 0, "shed": 0}
+
+    def _semaphore(self, lane: str) -> asyncio.Semaphore:
+        # Created lazily so the semaphores bind to the running event loop
+        if lane not in self._semaphores:
+            self._semaphores[lane] = asyncio.Semaphore(self.slots[lane])
+        return self._semaphores[lane]
+
+    def charge(self, client_id: str, cost: float) -> float:
+        """Charge a client's bucket; return the Retry-After delay (0 if allowed)"""
+        with self._bucket_lock:
+            bucket = self._buckets.get(client_id)
+            if bucket is None:
+                bucket = self._buckets[client_id] = TokenBucket(self.capacity, self.refill_rate)
+                while len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            self._buckets.move_to_end(client_id)
+            return bucket.take(cost)
+
+    def surcharge(self, client_id: str, path: str, cost: float) -> Optional[Dict[str, Any]]:
+        """Charge extra tokens once a handler knows a request's real size.
+
+        Returns None if allowed, otherwise a rejection like `admit`'s.
+        """
+        retry_after = self.charge(client_id, cost)
+        if retry_after <= 0:
+            return None
+        self.counters["rate_limited"] += 1
+        return {
+            "status_code": 429,
+            "retry_after": max(1, math.ceil(min(retry_after, 3600))),
+            "detail": f"Rate limit exceeded for {path} (cost {cost:g} tokens)"
+        }
+
+    def refund(self, client_id: str, cost: float) -> None:
+        """Return tokens for a request that was shed after being charged"""
+        with self._bucket_lock:
+            bucket = self._buckets.get(client_id)
+            if bucket is not None:
+                bucket.tokens = min(bucket.capacity, bucket.tokens + cost)
+
+    async def acquire(self, lane: str) -> bool:
+        """Take a concurrency slot in the lane, or return False if the request is shed"""
+        semaphore = self._semaphore(lane)
+        if lane == "batch" and semaphore.locked():
+            return False
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.in_flight[lane] += 1
+        return True
+
+    def release(self, lane: str) -> None:
+        self.in_flight[lane] -= 1
+        self._semaphore(lane).release()
+
+    async def admit(self, client_id: str, path: str, lane: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Decide whether to run a request.
+
+        Returns (holds_slot, rejection); rejection is None when admitted, otherwise
+        a dict with status_code, retry_after and detail for the error response.
+        """
+        cost = route_cost(path)
+        if cost is None:
+            return False, None
+
+        retry_after = self.charge(client_id, cost)
+        if retry_after > 0:
+            self.counters["rate_limited"] += 1
+            return False, {
+                "status_code": 429,
+                "retry_after": max(1, math.ceil(min(retry_after, 3600))),
+                "detail": f"Rate limit exceeded for {path} (cost {cost:g} tokens)"
+            }
+
+        if not await self.acquire(lane):
+            self.refund(client_id, cost)
+            self.counters["shed"] += 1
+            return False, {
+                "status_code": 503,
+                "retry_after": max(1, math.ceil(self.queue_timeout)),
+                "detail": f"Server busy: {lane} capacity exhausted, please retry"
+            }
+
+        self.counters["admitted"] += 1
+        return True, None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "in_flight": dict(self.in_flight),
+            "slots": dict(self.slots),
+            "tracked_clients": len(self._buckets),
+            "bucket_capacity": self.capacity,
+            "refill_per_second": self.refill_rate,
+            "route_costs": ROUTE_COSTS,
+        }
+
+
+def route_cost(path: str) -> Optional[float]:
+    """Token cost of a request path (None if the route is not rate limited)"""
+    cost = ROUTE_COSTS.get(path)
+    if cost is None and _ROUTE_TEMPLATES:
+        parts = path.split("/")
+        for template, template_cost in _ROUTE_TEMPLATES:
+            if len(template) == len(parts) and all(t == p or t.startswith("{") for t, p in zip(template, parts)):
+                return template_cost
+    return cost
+
+
+def request_lane(priority_header: Optional[str]) -> str:
+    """Map the X-Request-Priority header to a lane (interactive by default)"""
+    if priority_header and priority_header.strip().lower() == "batch":
+        return "batch"
+    return "interactive"
+
+
+def client_identity(peer: Optional[str], headers: Mapping[str, str], trusted_proxies: Collection[str]) -> str:
+    """Rate-limit identity for a request: the peer address.
+
+    X-Client-ID and X-Forwarded-For are client-controlled, so they are only
+    honoured when the peer is a trusted proxy (the router, the Streamlit
+    server), which must set or overwrite them itself.
+    """
+    peer = peer or "unknown"
+    if peer not in trusted_proxies:
+        return peer
+    if headers.get("x-client-id"):
+        return headers["x-client-id"]
+    # Rightmost forwarded address that is not one of our own proxies
+    for address in reversed(headers.get("x-forwarded-for", "").split(",")):
+        address = address.strip()
+        if address and address not in trusted_proxies:
+            return address
+    return peer
+
+
+def admin_allowed(peer: Optional[str], headers: Mapping[str, str], admin_token: str) -> bool:
+    """Whether a request may use admin routes.
+
+    With an admin token configured, the X-Admin-Token header must match it.
+    Without one, only direct callers on this host are allowed: loopback peers
+    whose request was not relayed by the router or the Streamlit server
+    (which add X-Forwarded-For / X-Client-ID).
+    """
+    if admin_token:
+        return hmac.compare_digest(headers.get("x-admin-token", "").encode(), admin_token.encode())
+    return peer in LOOPBACK and not headers.get("x-forwarded-for") and not headers.get("x-client-id")
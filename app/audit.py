@@ -0,0 +1,184 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Append-only audit trail of analysis requests in SQLite (WAL mode). Request
+# handlers only enqueue a record; one background thread writes records in
+# batches, so the request path never waits on disk. Drugs are stored in their
+# own indexed table so volume queries do not have to parse entity JSON.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    route TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    patient_age INTEGER,
+    text_length INTEGER,
+    entity_count INTEGER,
+    total_ms REAL,
+    timings TEXT,
+    cache TEXT,
+    models TEXT,
+    entities TEXT
+);
+CREATE TABLE IF NOT EXISTS analysis_drugs (
+    analysis_id INTEGER NOT NULL REFERENCES analyses(id),
+    ts REAL NOT NULL,
+    drug TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analyses_route_ts ON analyses(route, ts);
+CREATE INDEX IF NOT EXISTS analysis_drugs_drug_ts ON analysis_drugs(drug, ts);
+"""
+
+_STOP = object()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class AuditLog:
+    """Batched, asynchronous writer plus aggregate queries over the audit database
+
+    `record()` never blocks: when the queue is full the record is dropped and
+    counted. Records are flushed every `batch_size` records or
+    `flush_interval` seconds, whichever comes first.
+    """
+
+    def __init__(self, path: str, batch_size: int = 200, flush_interval: float = 1.0, max_queue: int = 10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._read_conn: Optional[sqlite3.Connection] = None
+        self._read_lock = threading.Lock()
+        self.counters = {"written": 0, "dropped": 0, "batches": 0, "errors": 0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = _connect(path)
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _ensure_writer(self) -> None:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                    self._thread.start()
+
+    def record(self, route: str, content_hash: str, entities: Optional[List[Dict[str, Any]]], timings: Dict[str, float],
+               cache: Dict[str, Any], models: Dict[str, Any], patient_age: Optional[int] = None,
+               text_length: Optional[int] = None) -> None:
+        """Queue one analysis for the audit log (non-blocking)"""
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((time.time(), route, content_hash, patient_age, text_length,
+                                    entities or [], timings, cache, models))
+        except queue.Full:
+            self.counters["dropped"] += 1
+
+    def _run(self) -> None:
+        conn = _connect(self.path)
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            if batch:
+                try:
+                    self._write(conn, batch)
+                except Exception as e:
+                    self.counters["errors"] += 1
+                    logger.error(f"Audit log write failed ({len(batch)} records): {e}")
+        conn.close()
+
+    def _write(self, conn: sqlite3.Connection, batch: List[tuple]) -> None:
+        with conn:
+            for ts, route, content_hash, patient_age, text_length, entities, timings, cache, models in batch:
+                cursor = conn.execute(
+                    "INSERT INTO analyses (ts, route, content_hash, patient_age, text_length, entity_count, total_ms,"
+                    " timings, cache, models, entities) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (ts, route, content_hash, patient_age, text_length, len(entities), timings.get("total"),
+                     json.dumps(timings), json.dumps(cache), json.dumps(models), json.dumps(entities))
+                )
+                drugs = {e["word"].lower() for e in entities if e.get("entity_group") == "MEDICATION"}
+                conn.executemany(
+                    "INSERT INTO analysis_drugs (analysis_id, ts, drug) VALUES (?, ?, ?)",
+                    [(cursor.lastrowid, ts, drug) for drug in sorted(drugs)]
+                )
+        self.counters["written"] += len(batch)
+        self.counters["batches"] += 1
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Flush queued records and stop the writer thread"""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._read_lock:
+            if self._read_conn is None:
+                self._read_conn = _connect(self.path)
+            return self._read_conn.execute(sql, params).fetchall()
+
+    def drug_volume(self, since: float = 0.0, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most frequently prescribed drugs since a Unix timestamp"""
+        rows = self._query(
+            "SELECT drug, COUNT(*) AS n FROM analysis_drugs WHERE ts >= ? GROUP BY drug ORDER BY n DESC, drug LIMIT ?",
+            (since, limit)
+        )
+        return [{"drug": drug, "count": count} for drug, count in rows]
+
+    def latency(self, since: float = 0.0) -> Dict[str, Dict[str, Any]]:
+        """Request count and total latency distribution (ms) per route since a Unix timestamp"""
+        by_route: Dict[str, List[float]] = {}
+        for route, total_ms in self._query(
+            "SELECT route, total_ms FROM analyses WHERE ts >= ? AND total_ms IS NOT NULL ORDER BY route, total_ms",
+            (since,)
+        ):
+            by_route.setdefault(route, []).append(total_ms)
+        return {
+            route: {
+                "count": len(values),
+                "mean_ms": round(sum(values) / len(values), 2),
+                "p50_ms": _percentile(values, 0.50),
+                "p95_ms": _percentile(values, 0.95),
+                "p99_ms": _percentile(values, 0.99),
+                "max_ms": values[-1],
+            }
+            for route, values in by_route.items()
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "queued": self._queue.qsize(), "path": self.path}
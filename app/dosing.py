@@ -0,0 +1,147 @@
+from typing import List, Dict, Any, Optional, Tuple
+
+# Daily-dose arithmetic over the structured DOSAGE entities produced by
+# app.extraction. All dosages of a prescription (or of a whole batch) are
+# converted to columns once and computed in a single NumPy pass.
+
+# Mass units convertible to milligrams; volume and activity units (ml, IU,
+# units) cannot be compared without a concentration and yield NaN.
+MG_PER_UNIT = {"mcg": 0.001, "mg": 1.0, "g": 1000.0}
+
+
+def dosage_columns(dosages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Columnar view of DOSAGE entities: amount (upper bound of a range), mg factor, units and doses per day"""
+    import numpy as np
+
+    nan = float("nan")
+    amount = np.array([d["amount_max"] if d.get("amount_max") is not None else d["amount"] for d in dosages], dtype=np.float64)
+    mg_factor = np.array([MG_PER_UNIT.get(d.get("unit"), nan) for d in dosages], dtype=np.float64)
+    units = np.array([d.get("units_per_dose", 1) if d.get("units_per_dose", 1) is not None else nan for d in dosages],
+                     dtype=np.float64)
+    per_day = np.array([d["frequency_per_day"] if d.get("frequency_per_day") is not None else nan for d in dosages],
+                       dtype=np.float64)
+    return {"amount": amount, "mg_factor": mg_factor, "units": units, "per_day": per_day}
+
+
+def daily_doses_mg(dosages: List[Dict[str, Any]]):
+    """Maximum total daily dose in mg for each dosage (NaN when unit, unit count or schedule is unknown)"""
+    columns = dosage_columns(dosages)
+    return columns["amount"] * columns["mg_factor"] * columns["units"] * columns["per_day"]
+
+
+# Age bands for dose limits: lower bounds of adolescent, adult and elderly.
+# Patients of unknown age are checked against the adult band.
+AGE_BANDS = ("child", "adolescent", "adult", "elderly")
+AGE_BAND_EDGES = (12, 18, 65)
+DEFAULT_BAND = AGE_BANDS.index("adult")
+
+# Maximum total daily dose in mg per age band (child, adolescent, adult,
+# elderly). These are conservative general references for flagging, not
+# weight-based dosing; 0 marks a drug that should not be given in that band.
+DOSE_LIMITS_MG = {
+    "paracetamol": (2000, 4000, 4000, 3000),
+    "ibuprofen": (800, 2400, 3200, 2400),
+    "aspirin": (0, 4000, 4000, 4000),
+    "amoxicillin": (2000, 3000, 4000, 4000),
+    "azithromycin": (500, 500, 500, 500),
+    "ciprofloxacin": (1500, 1500, 1500, 1000),
+    "cetirizine": (10, 10, 10, 5),
+    "omeprazole": (20, 40, 80, 40),
+    "metformin": (2000, 2000, 2550, 2000),
+    "atorvastatin": (20, 20, 80, 80),
+    "lisinopril": (40, 40, 80, 40),
+    "amlodipine": (5, 10, 10, 10),
+    "levothyroxine": (0.15, 0.2, 0.3, 0.2),
+}
+
+DRUG_ALIASES = {"acetaminophen": "paracetamol", "tylenol": "paracetamol", "advil": "ibuprofen"}
+
+DRUG_INDEX = {drug: i for i, drug in enumerate(DOSE_LIMITS_MG)}
+
+_limit_table = None
+
+
+def limit_table():
+    """Dose limits as a (drugs + 1, bands) float array; the last row (unknown drug) is NaN"""
+    global _limit_table
+    if _limit_table is None:
+        import numpy as np
+        _limit_table = np.vstack([
+            np.array(list(DOSE_LIMITS_MG.values()), dtype=np.float64),
+            np.full((1, len(AGE_BANDS)), np.nan),
+        ])
+    return _limit_table
+
+
+def drug_key(name: str) -> str:
+    """Normalize a medication name for the limit table"""
+    key = name.strip().lower()
+    return DRUG_ALIASES.get(key, key)
+
+
+def prescription_doses(entities: List[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+    """(drug, DOSAGE entity) pairs, as paired in the report"""
+    return [
+        (entity["word"], entities[i + 1])
+        for i, entity in enumerate(entities[:-1])
+        if entity.get("entity_group") == "MEDICATION" and entities[i + 1].get("entity_group") == "DOSAGE"
+    ]
+
+
+def check_prescriptions(prescriptions: List[Tuple[List[Dict[str, Any]], Optional[int]]]) -> List[List[Dict[str, Any]]]:
+    """Check total daily doses against the limit table for a batch of prescriptions.
+
+    `prescriptions` is a list of (entities, patient_age). Every dosage of the
+    batch is computed in one NumPy pass; doses of the same drug within a
+    prescription are summed. Returns, per prescription, one entry per drug with
+    daily_dose_mg, max_daily_mg, age_band and status: "exceeds", "within" or
+    "unverified" (no limit on file, or a dose without a mg unit, a clear unit
+    count or a fixed schedule). A limit of 0 marks the drug as contraindicated
+    in that age band and is always "exceeds", whatever the dose.
+    """
+    import numpy as np
+
+    pairs, owners = [], []
+    for index, (entities, _) in enumerate(prescriptions):
+        for pair in prescription_doses(entities):
+            pairs.append(pair)
+            owners.append(index)
+    results: List[List[Dict[str, Any]]] = [[] for _ in prescriptions]
+    if not pairs:
+        return results
+
+    ages = np.array([np.nan if age is None else age for _, age in prescriptions], dtype=np.float64)
+    bands = np.where(np.isnan(ages), DEFAULT_BAND, np.searchsorted(AGE_BAND_EDGES, np.nan_to_num(ages), side="right"))
+
+    # One row per (prescription, drug): sum daily doses and count unknown ones
+    names = [drug_key(drug) for drug, _ in pairs]
+    groups, group_of = np.unique(np.array([f"{o}\0{n}" for o, n in zip(owners, names)]), return_inverse=True)
+    doses = daily_doses_mg([dosage for _, dosage in pairs])
+    totals = np.bincount(group_of, weights=np.nan_to_num(doses), minlength=len(groups))
+    unknown = np.bincount(group_of, weights=np.isnan(doses), minlength=len(groups))
+    counts = np.bincount(group_of, minlength=len(groups))
+
+    first = np.zeros(len(groups), dtype=np.intp)
+    first[group_of[::-1]] = np.arange(len(pairs))[::-1]
+    group_owner = np.array(owners)[first]
+    drug_rows = np.array([DRUG_INDEX.get(names[i], len(DRUG_INDEX)) for i in first])
+    group_bands = bands[group_owner]
+    limits = limit_table()[drug_rows, group_bands]
+
+    status = np.where((limits == 0) | (totals > limits), "exceeds",
+                      np.where(np.isnan(limits) | (unknown > 0), "unverified", "within"))
+
+    for g in np.argsort(first, kind="stable"):
+        results[group_owner[g]].append({
+            "drug": pairs[first[g]][0],
+            "daily_dose_mg": None if unknown[g] == counts[g] else round(float(totals[g]), 3),
+            "max_daily_mg": None if np.isnan(limits[g]) else float(limits[g]),
+            "age_band": AGE_BANDS[group_bands[g]],
+            "status": str(status[g]),
+        })
+    return results
+
+
+def check_prescription(entities: List[Dict[str, Any]], patient_age: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Dose-limit check for a single prescription (see check_prescriptions)"""
+    return check_prescriptions([(entities, patient_age)])[0]
@@ -0,0 +1,76 @@
+import importlib
+import logging
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Heavy subsystems are imported on first use so workers that only serve text
+# or chat routes never pay for OpenCV, Tesseract or PyTorch imports.
+
+def _load_ocr() -> SimpleNamespace:
+    """Import the OCR stack (OpenCV, NumPy, PIL, pytesseract)"""
+    return SimpleNamespace(
+        cv2=importlib.import_module("cv2"),
+        np=importlib.import_module("numpy"),
+        Image=importlib.import_module("PIL.Image"),
+        pytesseract=importlib.import_module("pytesseract"),
+    )
+
+
+def _load_transformers() -> SimpleNamespace:
+    """Import PyTorch and Hugging Face transformers for local inference"""
+    return SimpleNamespace(
+        torch=importlib.import_module("torch"),
+        transformers=importlib.import_module("transformers"),
+    )
+
+
+ENGINE_LOADERS: Dict[str, Callable[[], Any]] = {
+    "ocr": _load_ocr,
+    "transformers": _load_transformers,
+}
+
+_engines: Dict[str, Any] = {}
+_load_times: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def get_engine(name: str) -> Any:
+    """Return a loaded subsystem, importing it on first use"""
+    engine = _engines.get(name)
+    if engine is not None:
+        return engine
+    with _lock:
+        if name not in _engines:
+            start = time.perf_counter()
+            _engines[name] = ENGINE_LOADERS[name]()
+            _load_times[name] = time.perf_counter() - start
+            logger.info(f"Loaded {name} engine in {_load_times[name] * 1000:.0f} ms")
+        return _engines[name]
+
+
+def warm_up(names: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Preload subsystems and report per-engine load status"""
+    results = {}
+    for name in names or list(ENGINE_LOADERS):
+        if name not in ENGINE_LOADERS:
+            results[name] = {"loaded": False, "error": "Unknown engine"}
+            continue
+        try:
+            get_engine(name)
+            results[name] = {"loaded": True, "load_ms": round(_load_times[name] * 1000, 1)}
+        except ImportError as e:
+            logger.warning(f"Could not preload {name} engine: {e}")
+            results[name] = {"loaded": False, "error": str(e)}
+    return results
+
+
+def engine_status() -> Dict[str, Any]:
+    """Report which subsystems are resident in this worker"""
+    return {
+        name: {"loaded": name in _engines, "load_ms": round(_load_times[name] * 1000, 1) if name in _load_times else None}
+        for name in ENGINE_LOADERS
+    }
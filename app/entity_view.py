@@ -0,0 +1,73 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+# Server-side shaping of entity lists for API responses: deduplication,
+# grouping by entity type with top-k per group, and pagination. Input entity
+# dicts are never modified, since coalesced requests share the same result.
+
+
+@dataclass
+class EntityView:
+    """How a response should present its entities (defaults: the full flat list)"""
+    group: bool = False
+    top_k: Optional[int] = None
+    dedupe: bool = False
+    offset: int = 0
+    limit: Optional[int] = None
+
+    @property
+    def is_default(self) -> bool:
+        return self == EntityView()
+
+
+def dedupe_entities(entities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One entity per (entity_group, word): first position, highest score, occurrence count.
+
+    A DOSAGE belongs to the medication before it, so equal doses of different
+    drugs ("500mg" of two drugs) stay separate.
+    """
+    merged: Dict[tuple, Dict[str, Any]] = {}
+    medication = None
+    for entity in entities:
+        group = entity.get("entity_group")
+        if group == "MEDICATION":
+            medication = entity.get("word")
+        key = (group, entity.get("word"), medication if group == "DOSAGE" else None)
+        existing = merged.get(key)
+        if existing is None:
+            merged[key] = {**entity, "count": 1}
+        else:
+            existing["count"] += 1
+            if entity.get("score", 0) > existing.get("score", 0):
+                existing["score"] = entity["score"]
+    return list(merged.values())
+
+
+def view_entities(entities: List[Dict[str, Any]], view: EntityView) -> Dict[str, Any]:
+    """Shape entities for a response.
+
+    Returns {"data": [...]} plus "total" when any option is set. With grouping,
+    "data" is replaced by "groups" (entity_group -> entities sorted by score,
+    at most top_k each) and "group_totals". Without grouping, top_k keeps the
+    highest-scoring entities and offset/limit page the flat list.
+    """
+    if view.is_default:
+        return {"data": entities}
+    if view.dedupe:
+        entities = dedupe_entities(entities)
+    shaped: Dict[str, Any] = {"total": len(entities)}
+    if view.group:
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for entity in entities:
+            groups.setdefault(entity.get("entity_group", "OTHER"), []).append(entity)
+        shaped["group_totals"] = {name: len(members) for name, members in groups.items()}
+        shaped["groups"] = {
+            name: sorted(members, key=lambda e: e.get("score", 0), reverse=True)[:view.top_k]
+            for name, members in groups.items()
+        }
+        return shaped
+    if view.top_k is not None:
+        entities = sorted(entities, key=lambda e: e.get("score", 0), reverse=True)[:view.top_k]
+    end = view.offset + view.limit if view.limit is not None else None
+    shaped.update(data=entities[view.offset:end], offset=view.offset, limit=view.limit)
+    return shaped
@@ -0,0 +1,302 @@
+import re
+from typing import List, Dict, Any, Optional, Tuple
+
+# Rule-based medical entity extraction. Patterns are compiled once and applied
+# line by line, so per-line results can be cached and reused when only part of
+# a prescription changes. A prescription split over two lines (drug on one,
+# dose on the next, or a dose whose schedule follows on the next line) is
+# extracted from the two lines joined.
+
+# Frequency and route vocabulary: surface term -> (entity group, label, score).
+# Terms are matched on word boundaries, longest term first, so "od" does not
+# fire inside "food" and "twice daily" yields a single BID entity.
+TERM_TABLE = {
+    # Frequency
+    "tid": ("FREQUENCY", "TID", 0.85),
+    "three times daily": ("FREQUENCY", "TID", 0.85),
+    "3 times daily": ("FREQUENCY", "TID", 0.85),
+    "bid": ("FREQUENCY", "BID", 0.85),
+    "twice daily": ("FREQUENCY", "BID", 0.85),
+    "2 times daily": ("FREQUENCY", "BID", 0.85),
+    "od": ("FREQUENCY", "OD", 0.85),
+    "once daily": ("FREQUENCY", "OD", 0.85),
+    "daily": ("FREQUENCY", "OD", 0.85),
+    "qid": ("FREQUENCY", "QID", 0.85),
+    "four times daily": ("FREQUENCY", "QID", 0.85),
+    "4 times daily": ("FREQUENCY", "QID", 0.85),
+    "as needed": ("FREQUENCY", "PRN", 0.85),
+    "prn": ("FREQUENCY", "PRN", 0.85),
+    # Route of administration
+    "oral": ("ROUTE", "Oral", 0.80),
+    "orally": ("ROUTE", "Oral", 0.80),
+    "by mouth": ("ROUTE", "Oral", 0.80),
+    "po": ("ROUTE", "Oral", 0.80),
+    "topical": ("ROUTE", "Topical", 0.80),
+    "apply": ("ROUTE", "Topical", 0.80),
+    "injection": ("ROUTE", "Injection", 0.80),
+    "inject": ("ROUTE", "Injection", 0.80),
+    "iv": ("ROUTE", "Injection", 0.80),
+}
+
+# Report wording per frequency label, in report order
+FREQUENCY_REPORT_LABELS = {
+    "TID": "TID (three times daily)",
+    "BID": "BID (twice daily)",
+    "OD": "OD (once daily)",
+    "QID": "QID (four times daily)",
+    "PRN": "PRN (as needed)",
+}
+
+# Administrations per day for each frequency label (PRN has no fixed schedule)
+FREQUENCY_PER_DAY = {"TID": 3, "BID": 2, "OD": 1, "QID": 4, "PRN": None}
+
+UNIT_ALIASES = {
+    "mcg": "mcg", "µg": "mcg", "μg": "mcg", "ug": "mcg",
+    "mg": "mg", "g": "g", "ml": "ml",
+    "iu": "IU", "unit": "units", "units": "units",
+}
+
+# Words that can sit directly before a dose but are never the drug name:
+# dosage forms (skipped between the drug and its dose, as in "Amoxicillin susp
+# 250mg") and instruction verbs or fillers ("Take 10 ml", "max 4 g").
+DOSAGE_FORMS = (
+    "tab", "tabs", "tablet", "tablets", "cap", "caps", "capsule", "capsules", "susp", "suspension",
+    "syr", "syrup", "sol", "soln", "solution", "inj", "amp", "ampoule", "drop", "drops", "gtt",
+    "cream", "oint", "ointment", "gel", "lotion", "patch", "patches", "puff", "puffs", "spray", "sprays",
+    "sachet", "sachets", "supp", "suppository", "suppositories", "ampoules", "elixir", "liquid",
+)
+# Dosage forms counted per administration ("2 tabs", "1-2 capsules", "2 puffs")
+UNIT_FORMS = (
+    "tab", "tabs", "tablet", "tablets", "cap", "caps", "capsule", "capsules", "puff", "puffs", "drop", "drops",
+    "gtt", "sachet", "sachets", "supp", "suppository", "suppositories", "patch", "patches", "spray", "sprays",
+    "amp", "ampoule", "ampoules",
+)
+COUNT_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "half": 0.5, "half a": 0.5, "half an": 0.5}
+NON_DRUG_WORDS = DOSAGE_FORMS + (
+    "take", "takes", "taking", "give", "given", "use", "continue", "start", "stop", "administer",
+    "inhale", "instil", "instill", "chew", "dissolve", "swallow", "mix", "dilute", "rx", "sig",
+    "dose", "doses", "then", "and", "plus", "with", "of", "each", "per", "max", "maximum", "total", "up",
+)
+# Drug names that take a second word ("Insulin glargine", "Vitamin D3", "Folic acid")
+NAME_HEADS = ("insulin", "vitamin", "folic", "ferrous", "potassium", "sodium", "calcium", "magnesium", "zinc")
+
+DURATION_DAYS = {"d": 1, "day": 1, "days": 1, "wk": 7, "wks": 7, "week": 7, "weeks": 7, "month": 30, "months": 30}
+
+_TERMS = "|".join(
+    re.escape(term).replace(r"\ ", r"\s+") for term in sorted(TERM_TABLE, key=len, reverse=True)
+)
+_NUMBER = r"\d+(?:\.\d+)?|\.\d+"
+_NOT_DRUG = "|".join((_TERMS, *NON_DRUG_WORDS))
+_FORMS = "|".join(DOSAGE_FORMS)
+_UNIT_FORMS = "|".join(sorted(UNIT_FORMS, key=len, reverse=True))
+_COUNT = r"(?<![\d./])(?:\d+\s*/\s*\d+|\d+(?:\.\d+)?|half(?:\s+an?)?|an?|one|two|three|four)"
+_HEADS = "|".join(NAME_HEADS)
+
+# One grammar for a whole line, scanned in a single pass. Alternatives:
+#   dose      Drug 500mg / Drug 0.5 mg / Drug 1-2 g / Drug 100 IU / Drug susp 5 ml /
+#             Insulin glargine 10 units / B12 1000mcg (never a dosage form or verb as the drug)
+#   term      frequency and route vocabulary (TERM_TABLE)
+#   interval  q4h / every 6 hours
+#   duration  x 7 days / for 2 weeks
+#   count     units per administration: 2 tabs / 1-2 capsules / half a tablet /
+#             a few tablets (vague, so the dose cannot be totalled)
+LINE_PATTERN = re.compile(
+    rf"""
+    (?P<drug>\b(?=[A-Z][a-zA-Z0-9\-]*(?:\s+[a-zA-Z][a-zA-Z0-9\-]*\.?)?\s*\.?\d)  # cheap guard: a word or two, then a number
+        (?:(?:{_HEADS})\s+(?!(?:{_NOT_DRUG})\b)[A-Z][a-zA-Z0-9\-]*
+          |(?!(?:{_NOT_DRUG})(?:\b|\d))[A-Z](?:[a-zA-Z\-]+|[a-zA-Z\-]*\d[a-zA-Z0-9\-]*(?=\s))))  # B12, D3: digits need a space before the dose
+        (?:\s+(?:{_FORMS})\b\.?)?\s*
+        (?P<amount>{_NUMBER})(?:\s*(?:-|to)\s*(?P<amount_max>{_NUMBER}))?\s*
+        (?P<unit>mcg|µg|μg|ug|mg|g|ml|iu|units?)(?![a-zA-Z])
+    | (?P<term>\b(?:{_TERMS})\b)
+    | (?P<interval>\b(?:q\s*(?P<every_q>\d+)\s*h|every\s+(?P<every_n>\d+)\s*(?:hours?|hrs?))\b)
+    | (?P<duration>\b(?:x|for)\s*(?P<duration_n>\d+)\s*(?P<duration_unit>days?|d|weeks?|wks?|months?)\b)
+    | (?P<count>\b(?:(?P<count_vague>(?:a\s+)?few|several|some)
+                  |(?P<count_n>{_COUNT})(?:\s*(?:-|to|or)\s*(?P<count_max>{_COUNT}))?)\s*(?:{_UNIT_FORMS})\b)
+    """,
+    re.IGNORECASE | re.VERBOSE
+)
+# A line that starts with a dose, continuing a drug named on the line before
+DOSE_START = re.compile(rf"\s*(?:{_NUMBER})\s*(?:mcg|µg|μg|ug|mg|g|ml|iu|units?)(?![a-zA-Z])", re.IGNORECASE)
+
+
+def _number(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def _count(value: str) -> Optional[float]:
+    """Numeric value of a unit count ("2", "1/2", "half a"); None for a zero denominator"""
+    value = " ".join(value.lower().split())
+    if value in COUNT_WORDS:
+        return COUNT_WORDS[value]
+    if "/" in value:
+        numerator, denominator = (float(part) for part in value.split("/"))
+        return _number(str(numerator / denominator)) if denominator else None
+    return _number(value)
+
+
+def extract_line_entities(line: str) -> List[Dict[str, Any]]:
+    """Extract entities from a single line; offsets are relative to the line.
+
+    DOSAGE entities carry structured fields (amount, amount_max, unit,
+    units_per_dose, frequency_per_day, duration_days); frequency and duration
+    are taken from the first schedule terms that follow the dose on the same
+    line. units_per_dose is the upper bound of the stated unit count ("1-2
+    capsules" -> 2, a count before the drug applies to its dose), 1 when none
+    is stated and None when it is vague or contradicted by a second count.
+    """
+    entities = []
+    current_dose = None
+    units_stated = False
+    pending_units, pending_stated = None, False
+    for match in LINE_PATTERN.finditer(line):
+        if match.group("drug"):
+            amount, amount_max = _number(match.group("amount")), _number(match.group("amount_max"))
+            unit = UNIT_ALIASES[match.group("unit").lower()]
+            entities.append({
+                "word": match.group("drug").capitalize(),
+                "entity_group": "MEDICATION",
+                "score": 0.95,
+                "start": match.start("drug"),
+                "end": match.end("drug")
+            })
+            current_dose = {
+                "word": f"{amount}{'-' + str(amount_max) if amount_max is not None else ''}{unit}",
+                "entity_group": "DOSAGE",
+                "score": 0.90,
+                "start": match.start("amount"),
+                "end": match.end("unit"),
+                "amount": amount,
+                "amount_max": amount_max,
+                "unit": unit,
+                "units_per_dose": pending_units if pending_stated else 1,
+                "frequency": None,
+                "frequency_per_day": None,
+                "duration_days": None
+            }
+            entities.append(current_dose)
+            units_stated = pending_stated
+            pending_units, pending_stated = None, False
+        elif match.group("term"):
+            group, label, score = TERM_TABLE[" ".join(match.group("term").lower().split())]
+            entities.append({
+                "word": label,
+                "entity_group": group,
+                "score": score,
+                "start": match.start(),
+                "end": match.end()
+            })
+            if group == "FREQUENCY" and current_dose is not None and current_dose["frequency"] is None:
+                current_dose["frequency"] = label
+                current_dose["frequency_per_day"] = FREQUENCY_PER_DAY[label]
+        elif match.group("interval"):
+            hours = int(match.group("every_q") or match.group("every_n"))
+            label = f"Q{hours}H"
+            entities.append({
+                "word": label,
+                "entity_group": "FREQUENCY",
+                "score": 0.85,
+                "start": match.start(),
+                "end": match.end()
+            })
+            if current_dose is not None and current_dose["frequency"] is None and hours > 0:
+                current_dose["frequency"] = label
+                current_dose["frequency_per_day"] = round(24 / hours, 2)
+        elif match.group("count"):
+            count = None if match.group("count_vague") else _count(match.group("count_max") or match.group("count_n"))
+            if current_dose is None:
+                pending_units = count if not pending_stated or pending_units == count else None
+                pending_stated = True
+            elif not units_stated:
+                current_dose["units_per_dose"] = count
+                units_stated = True
+            elif current_dose["units_per_dose"] != count:
+                current_dose["units_per_dose"] = None
+        else:
+            days = int(match.group("duration_n")) * DURATION_DAYS[match.group("duration_unit").lower()]
+            entities.append({
+                "word": f"{days} days",
+                "entity_group": "DURATION",
+                "score": 0.85,
+                "start": match.start(),
+                "end": match.end()
+            })
+            if current_dose is not None and current_dose["duration_days"] is None:
+                current_dose["duration_days"] = days
+    return entities
+
+
+def continues_on_next_line(entities: List[Dict[str, Any]], next_line: str, next_entities: List[Dict[str, Any]]) -> bool:
+    """Whether a line (given its entities) continues on the next one, which names no drug of its own:
+    its last dose has no schedule yet, or it has no dose and the next line starts with one"""
+    if not next_line.strip() or any(e["entity_group"] == "MEDICATION" for e in next_entities):
+        return False
+    doses = [e for e in entities if e["entity_group"] == "DOSAGE"]
+    if doses:
+        return doses[-1]["frequency"] is None
+    return DOSE_START.match(next_line) is not None
+
+
+def extract_entities_by_line(text: str, known_lines: Optional[Dict[str, List[Dict[str, Any]]]] = None) -> Tuple[List[Dict[str, Any]], Dict[str, List[Dict[str, Any]]], int]:
+    """Extract entities from text, reusing results for lines seen before.
+
+    `known_lines` maps line content to its line-relative entities (as returned
+    in a previous call); pairs of lines extracted together are stored under
+    their joined content. Returns (entities with absolute offsets, line map
+    for this text, number of lines that had to be extracted).
+    """
+    known_lines = known_lines or {}
+    line_entities: Dict[str, List[Dict[str, Any]]] = {}
+    extracted = 0
+
+    def lookup(segment: str, single_line: bool = True) -> List[Dict[str, Any]]:
+        nonlocal extracted
+        relative = line_entities.get(segment)
+        if relative is None:
+            relative = known_lines.get(segment)
+            if relative is None:
+                relative = extract_line_entities(segment)
+                extracted += single_line
+            line_entities[segment] = relative
+        return relative
+
+    lines = text.splitlines(keepends=True)
+    entities = []
+    offset = 0
+    i = 0
+    while i < len(lines):
+        segment, relative = lines[i], lookup(lines[i])
+        if i + 1 < len(lines) and continues_on_next_line(relative, lines[i + 1], lookup(lines[i + 1])):
+            segment = lines[i] + lines[i + 1]
+            relative = lookup(segment, single_line=False)
+            i += 1
+        for entity in relative:
+            entities.append({**entity, "start": entity["start"] + offset, "end": entity["end"] + offset})
+        offset += len(segment)
+        i += 1
+    return entities, line_entities, extracted
+
+
+def extract_entities(text: str) -> List[Dict[str, Any]]:
+    """Extract medication, dosage, frequency and route entities from text"""
+    return extract_entities_by_line(text)[0]
+
+
+def summarize_entities(entities: List[Dict[str, Any]]) -> Tuple[List[str], List[str]]:
+    """Derive report lines from entities: ("Drug 500mg" strings, frequency labels)"""
+    drugs_found = []
+    present = set()
+    intervals = {}
+    for i, entity in enumerate(entities):
+        group = entity.get("entity_group")
+        if group == "MEDICATION" and i + 1 < len(entities) and entities[i + 1].get("entity_group") == "DOSAGE":
+            drugs_found.append(f"{entity['word']} {entities[i + 1]['word']}")
+        elif group == "FREQUENCY":
+            present.add(entity["word"])
+            if entity["word"] not in FREQUENCY_REPORT_LABELS:
+                intervals.setdefault(entity["word"], f"{entity['word']} (every {entity['word'][1:-1]} hours)")
+    frequencies = [report_label for label, report_label in FREQUENCY_REPORT_LABELS.items() if label in present]
+    return drugs_found, frequencies + list(intervals.values())
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.engines import get_engine
+
+logger = logging.getLogger(__name__)
+
+# Local CPU text generation for report sections. Every request starts with the
+# same long instruction prompt, so its key/value state is computed once per
+# loaded model and reused: each request only runs its own short suffix through
+# the model before decoding. Concurrent requests are grouped into micro-batches
+# by a single worker thread, and every request's new tokens are capped.
+
+
+class PrefixCachedGenerator:
+    """Batched greedy generation that reuses the KV cache of a fixed prompt prefix
+
+    `get_pipeline` returns a transformers text-generation pipeline (for example
+    from the model registry). It is called for every batch; when it returns a
+    different object (the model was evicted and reloaded) the prefix cache is
+    rebuilt. Call `release()` when the model is evicted so the generator does
+    not keep it, or its prefix cache, resident between batches. Rows of a batch are laid out as prefix, padding, suffix, with the
+    padding masked out, so all rows share the cached prefix positions.
+    """
+
+    def __init__(self, get_pipeline: Callable[[], Any], prefix: str, max_new_tokens: int = 64,
+                 max_batch: int = 8, batch_wait: float = 0.01):
+        self.get_pipeline = get_pipeline
+        self.prefix = prefix
+        self.max_new_tokens = max_new_tokens
+        self.max_batch = max(1, max_batch)
+        self.batch_wait = batch_wait
+        self._queue: "queue.Queue[Tuple[str, int, Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._pipeline: Any = None
+        self._prefix_ids: Any = None
+        self._prefix_cache: Any = None
+        self.prefix_builds = 0
+        self.prefix_build_ms = 0.0
+        self.requests = 0
+        self.batches = 0
+        self.tokens_generated = 0
+        self.generation_ms = 0.0
+
+    def submit(self, prompt: str, max_new_tokens: Optional[int] = None) -> Future:
+        """Queue a prompt (the text after the shared prefix); never exceeds the configured token cap"""
+        if self._worker is None:
+            with self._start_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="report-generator", daemon=True)
+                    self._worker.start()
+        limit = min(max_new_tokens or self.max_new_tokens, self.max_new_tokens)
+        future: Future = Future()
+        self._queue.put((prompt, limit, future))
+        return future
+
+    async def generate(self, prompt: str, max_new_tokens: Optional[int] = None) -> str:
+        return await asyncio.wrap_future(self.submit(prompt, max_new_tokens))
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                texts = self._generate_batch([prompt for prompt, _, _ in batch], [limit for _, limit, _ in batch])
+            except Exception as e:
+                logger.error(f"Report generation failed for a batch of {len(batch)}: {e}")
+                for _, _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, _, future), text in zip(batch, texts):
+                    future.set_result(text)
+
+    def release(self) -> None:
+        """Drop the references to the pipeline and its prefix cache (e.g. on model eviction)"""
+        with self._state_lock:
+            self._pipeline = self._prefix_ids = self._prefix_cache = None
+
+    def _prefix_state(self, pipeline: Any) -> Tuple[Any, Any]:
+        """Prefix token ids and per-layer (key, value) tensors for the current model"""
+        with self._state_lock:
+            if pipeline is self._pipeline:
+                return self._prefix_ids, self._prefix_cache
+        torch = get_engine("transformers").torch
+        start = time.perf_counter()
+        prefix_ids = pipeline.tokenizer(self.prefix, return_tensors="pt").input_ids
+        with torch.inference_mode():
+            past = pipeline.model(input_ids=prefix_ids, use_cache=True).past_key_values
+        prefix_cache = past.to_legacy_cache() if hasattr(past, "to_legacy_cache") else past
+        with self._state_lock:
+            self._pipeline, self._prefix_ids, self._prefix_cache = pipeline, prefix_ids, prefix_cache
+        self.prefix_builds += 1
+        self.prefix_build_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"Cached {prefix_ids.shape[1]}-token report prefix in {self.prefix_build_ms:.0f} ms")
+        return prefix_ids, prefix_cache
+
+    def _generate_batch(self, prompts: List[str], limits: List[int]) -> List[str]:
+        engine = get_engine("transformers")
+        torch = engine.torch
+        pipeline = self.get_pipeline()
+        tokenizer, model = pipeline.tokenizer, pipeline.model
+        prefix_ids, prefix_cache = self._prefix_state(pipeline)
+        start = time.perf_counter()
+
+        rows = len(prompts)
+        pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+        suffixes = [tokenizer(prompt, add_special_tokens=False).input_ids for prompt in prompts]
+        width = max(len(suffix) for suffix in suffixes)
+        suffix_ids = torch.tensor([[pad_id] * (width - len(s)) + s for s in suffixes], dtype=prefix_ids.dtype)
+        suffix_mask = torch.tensor([[0] * (width - len(s)) + [1] * len(s) for s in suffixes], dtype=torch.long)
+        input_ids = torch.cat([prefix_ids.expand(rows, -1), suffix_ids], dim=1)
+        attention_mask = torch.cat([torch.ones(rows, prefix_ids.shape[1], dtype=torch.long), suffix_mask], dim=1)
+
+        # A fresh cache object per batch over expanded views of the prefix
+        # tensors: generation appends to the cache, never to the prefix itself
+        past = tuple(tuple(t.expand(rows, *t.shape[1:]) for t in layer) for layer in prefix_cache)
+        if getattr(model, "_supports_cache_class", False):
+            past = engine.transformers.DynamicCache.from_legacy_cache(past)
+        with torch.inference_mode():
+            output = model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                past_key_values=past,
+                max_new_tokens=max(limits),
+                do_sample=False,
+                pad_token_id=pad_id,
+            )
+        new_tokens = output[:, input_ids.shape[1]:]
+        texts = []
+        for row, limit in zip(new_tokens, limits):
+            row = row[:limit]
+            self.tokens_generated += int((row != pad_id).sum())
+            texts.append(tokenizer.decode(row, skip_special_tokens=True).strip())
+
+        self.requests += rows
+        self.batches += 1
+        self.generation_ms += (time.perf_counter() - start) * 1000
+        return texts
+
+    def stats(self) -> Dict[str, Any]:
+        prefix_ids = self._prefix_ids
+        return {
+            "prefix_tokens": int(prefix_ids.shape[1]) if prefix_ids is not None else None,
+            "prefix_builds": self.prefix_builds,
+            "prefix_build_ms": round(self.prefix_build_ms, 1),
+            "max_new_tokens": self.max_new_tokens,
+            "max_batch": self.max_batch,
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": round(self.requests / self.batches, 2) if self.batches else None,
+            "tokens_generated": self.tokens_generated,
+            "generation_ms_per_batch": round(self.generation_ms / self.batches, 1) if self.batches else None,
+            "queued": self._queue.qsize(),
+        }
@@ -0,0 +1,88 @@
+import bisect
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional
+
+# Consistent hashing for cache-affine routing across backend nodes. Each node
+# owns `vnodes` points on a 64-bit ring; a key belongs to the first point at or
+# after its own hash. Adding or removing a node only moves the keys between
+# that node's points and their predecessors (about 1/n of all keys), so the
+# other nodes keep their warm caches.
+
+
+def _point(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Thread-safe consistent-hash ring of node names with virtual nodes"""
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 160):
+        self.vnodes = vnodes
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self._nodes: set = set()
+        self._lock = threading.Lock()
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return sorted(self._nodes)
+
+    def _rebuild(self) -> None:
+        ring = sorted((_point(f"{node}#{i}"), node) for node in self._nodes for i in range(self.vnodes))
+        self._points = [point for point, _ in ring]
+        self._owners = [node for _, node in ring]
+
+    def add(self, node: str) -> bool:
+        """Add a node; returns False if it was already present"""
+        with self._lock:
+            if node in self._nodes:
+                return False
+            self._nodes.add(node)
+            self._rebuild()
+            return True
+
+    def remove(self, node: str) -> bool:
+        """Remove a node; returns False if it was not present"""
+        with self._lock:
+            if node not in self._nodes:
+                return False
+            self._nodes.discard(node)
+            self._rebuild()
+            return True
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Node owning `key`, or None when the ring is empty"""
+        preference = self.preference(key, 1)
+        return preference[0] if preference else None
+
+    def preference(self, key: str, count: int) -> List[str]:
+        """Up to `count` distinct nodes in ring order from `key`: the owner, then its failover successors"""
+        with self._lock:
+            points, owners = self._points, self._owners
+        if not points:
+            return []
+        start = bisect.bisect_left(points, _point(key))
+        found: List[str] = []
+        for i in range(len(points)):
+            owner = owners[(start + i) % len(points)]
+            if owner not in found:
+                found.append(owner)
+                if len(found) == count:
+                    break
+        return found
+
+    def shares(self) -> Dict[str, float]:
+        """Fraction of the hash space owned by each node"""
+        with self._lock:
+            points, owners = self._points, self._owners
+        if not points:
+            return {}
+        space = 2 ** 64
+        shares = {node: 0 for node in owners}
+        for i, point in enumerate(points):
+            previous = points[i - 1] if i else points[-1] - space
+            shares[owners[i]] += point - previous
+        return {node: round(size / space, 4) for node, size in sorted(shares.items())}
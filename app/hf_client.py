@@ -0,0 +1,96 @@
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# HTTP client for the Hugging Face inference API (or any server speaking the
+# same protocol, such as mock_hf_server.py). Connections are kept alive in a
+# pool sized for the expected concurrency, so each call skips the TCP and TLS
+# handshakes. Optional retries cover 503 "model loading" responses (waiting
+# the server's estimated_time, capped) and transient 5xx or connection errors.
+
+RETRY_STATUSES = {500, 502, 503, 504}
+
+
+class InferenceClient:
+    """Pooled, retrying POST client for `{base_url}/models/{model_id}`
+
+    pool_size=0 disables connection reuse (a new connection per call), which
+    is only useful as a benchmark baseline.
+    """
+
+    def __init__(self, base_url: str, pool_size: int = 16, timeout: float = 30.0,
+                 retries: int = 0, max_loading_wait: float = 20.0, backoff: float = 0.2):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        self.max_loading_wait = max_loading_wait
+        self.backoff = backoff
+        self._session: Optional[requests.Session] = None
+        if pool_size > 0:
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._counts: Counter = Counter()
+
+    def url(self, model_id: str) -> str:
+        return f"{self.base_url}/models/{model_id}"
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] += 1
+
+    def _retry_delay(self, response: Optional[requests.Response], attempt: int) -> float:
+        """Seconds to wait before retrying: the server's loading estimate, else exponential backoff"""
+        if response is not None and response.status_code == 503:
+            try:
+                estimated = float(response.json().get("estimated_time", 0))
+            except (ValueError, AttributeError):
+                estimated = 0
+            if estimated > 0:
+                return min(estimated, self.max_loading_wait)
+        return self.backoff * 2 ** attempt * (0.5 + random.random())
+
+    def post(self, model_id: str, payload: Dict[str, Any], headers: Dict[str, str]) -> requests.Response:
+        """POST a payload, retrying retryable failures; blocking, run it in a thread"""
+        send = self._session.post if self._session is not None else requests.post
+        attempt = 0
+        while True:
+            self._count("requests")
+            response = None
+            try:
+                response = send(self.url(model_id), headers=headers, json=payload, timeout=self.timeout)
+            except requests.exceptions.ConnectionError:
+                self._count("connection_errors")
+                if attempt >= self.retries:
+                    raise
+            else:
+                self._count(f"status_{response.status_code}")
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    return response
+            delay = self._retry_delay(response, attempt)
+            attempt += 1
+            self._count("retries")
+            logger.info(f"Retrying {model_id} in {delay:.2f}s "
+                        f"({response.status_code if response is not None else 'connection error'})")
+            time.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            "base_url": self.base_url,
+            "pool_size": self.pool_size,
+            "retries": self.retries,
+            "counts": counts,
+        }
@@ -0,0 +1,55 @@
+import uuid
+from dataclasses import dataclass
+from typing import Optional, Dict, List, Any, Tuple
+
+from app.cache import LRUCache
+
+
+@dataclass
+class AnalysisState:
+    """What incremental re-analysis needs to know about a previous analysis"""
+    text: str
+    patient_age: Optional[int]
+    line_entities: Dict[str, List[Dict[str, Any]]]
+
+
+class AnalysisStore:
+    """Recently completed text analyses, addressable by analysis ID (LRU-bounded)"""
+
+    def __init__(self, max_entries: int = 1024):
+        self._cache = LRUCache(max_entries)
+
+    def save(self, text: str, patient_age: Optional[int], line_entities: Dict[str, List[Dict[str, Any]]]) -> str:
+        analysis_id = uuid.uuid4().hex
+        self._cache.put(analysis_id, AnalysisState(text, patient_age, line_entities))
+        return analysis_id
+
+    def get(self, analysis_id: str) -> Optional[AnalysisState]:
+        return self._cache.get(analysis_id)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+def changed_lines(text: str, known_lines: Dict[str, List[Dict[str, Any]]]) -> Tuple[int, int]:
+    """(distinct lines of `text` not analyzed before, total lines) - the work an incremental run will do"""
+    lines = text.splitlines(keepends=True)
+    return len({line for line in lines if line not in known_lines}), max(len(lines), 1)
+
+
+def apply_edits(text: str, edits: List[Dict[str, Any]]) -> str:
+    """Apply [{"start", "end", "text"}] replacements, expressed against the original text.
+
+    Raises ValueError for out-of-range or overlapping edits.
+    """
+    result = []
+    position = 0
+    for edit in sorted(edits, key=lambda e: (e["start"], e["end"])):
+        start, end = int(edit["start"]), int(edit["end"])
+        if start < position or end < start or end > len(text):
+            raise ValueError(f"Invalid edit range {start}-{end}")
+        result.append(text[position:start])
+        result.append(str(edit.get("text", "")))
+        position = end
+    result.append(text[position:])
+    return "".join(result)
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Event-loop health for the API worker. A probe coroutine sleeps for a fixed
+# interval and records how late it wakes up (the loop lag). A watchdog thread
+# watches the probe's heartbeat; when the loop has not run for longer than the
+# threshold it captures the loop thread's stack, which shows the code that is
+# blocking it. In debug mode an audit hook also reports synchronous I/O
+# (files, sockets, subprocesses) started from inside a running coroutine.
+
+SYNC_IO_EVENTS = {"open", "socket.connect", "socket.getaddrinfo", "subprocess.Popen", "os.system"}
+MODULE_SUFFIXES = (".py", ".pyc", ".so", ".pth")
+
+
+class LoopLagMonitor:
+    """Continuous event-loop lag measurement with stall stack capture"""
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25, window: int = 600, max_stalls: int = 20):
+        self.interval = interval
+        self.threshold = threshold
+        self._lags: deque = deque(maxlen=window)
+        self.stalls: deque = deque(maxlen=max_stalls)
+        self.max_lag = 0.0
+        self.slow_ticks = 0
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._pending_stall: Optional[Dict[str, Any]] = None
+
+    def start(self) -> None:
+        """Start probing the running event loop (call from a coroutine on that loop)"""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._probe())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _probe(self) -> None:
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - before - self.interval)
+            self._heartbeat = now
+            self._lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.threshold:
+                self.slow_ticks += 1
+                stall, self._pending_stall = self._pending_stall, None
+                if stall is not None:
+                    stall["blocked_ms"] = round(lag * 1000, 1)  # the full stall, now that it has ended
+                    logger.warning(f"Event loop blocked for {lag * 1000:.0f} ms in:\n{''.join(stall['stack'][-6:])}")
+
+    def _watch(self) -> None:
+        captured_for = None
+        while not self._stopped.wait(self.interval / 2):
+            heartbeat = self._heartbeat
+            if time.monotonic() - heartbeat - self.interval > self.threshold and captured_for != heartbeat:
+                captured_for = heartbeat
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is None:
+                    continue
+                stall = {
+                    "time": round(time.time(), 3),
+                    "blocked_ms": round((time.monotonic() - heartbeat - self.interval) * 1000, 1),
+                    "stack": traceback.format_stack(frame),
+                }
+                self.stalls.append(stall)
+                self._pending_stall = stall
+
+    def stats(self) -> Dict[str, Any]:
+        lags = sorted(self._lags)
+
+        def quantile(q: float) -> Optional[float]:
+            return round(lags[min(len(lags) - 1, int(q * len(lags)))] * 1000, 2) if lags else None
+
+        return {
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "samples": len(lags),
+            "lag_p50_ms": quantile(0.50),
+            "lag_p99_ms": quantile(0.99),
+            "lag_max_ms": round(self.max_lag * 1000, 2),
+            "slow_ticks": self.slow_ticks,
+            "recent_stalls": [
+                {"time": s["time"], "blocked_ms": s["blocked_ms"], "stack": s["stack"][-8:]} for s in self.stalls
+            ],
+        }
+
+    def prometheus(self) -> str:
+        """Lag metrics in the Prometheus text exposition format"""
+        stats = self.stats()
+        lines = [
+            "# HELP event_loop_lag_seconds Delay between scheduled and actual wake-up of the loop probe",
+            "# TYPE event_loop_lag_seconds summary",
+        ]
+        for quantile, key in (("0.5", "lag_p50_ms"), ("0.99", "lag_p99_ms")):
+            if stats[key] is not None:
+                lines.append(f'event_loop_lag_seconds{{quantile="{quantile}"}} {round(stats[key] / 1000, 6)}')
+        lines += [
+            "# HELP event_loop_lag_max_seconds Largest loop lag observed since start",
+            "# TYPE event_loop_lag_max_seconds gauge",
+            f"event_loop_lag_max_seconds {round(stats['lag_max_ms'] / 1000, 6)}",
+            "# HELP event_loop_slow_ticks_total Probe wake-ups later than the stall threshold",
+            "# TYPE event_loop_slow_ticks_total counter",
+            f"event_loop_slow_ticks_total {self.slow_ticks}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+class SyncIOAuditor:
+    """Debug aid: flag synchronous I/O started inside a running coroutine
+
+    Uses a sys.addaudithook hook, which cannot be removed, so install it only in
+    debug mode. Each call site is reported once.
+    """
+
+    def __init__(self):
+        self.flagged: Dict[str, Dict[str, Any]] = {}
+        self._local = threading.local()
+        self._installed = False
+
+    def install(self) -> None:
+        if not self._installed:
+            sys.addaudithook(self._hook)
+            self._installed = True
+
+    def _hook(self, event: str, args: tuple) -> None:
+        if event not in SYNC_IO_EVENTS or getattr(self._local, "active", False):
+            return
+        if event == "open" and isinstance(args[0], str) and args[0].endswith(MODULE_SUFFIXES):
+            return  # imports and source lookups for tracebacks (asyncio debug mode)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return  # not on an event-loop thread (e.g. asyncio.to_thread workers)
+        self._local.active = True
+        try:
+            frames = [
+                f for f in traceback.extract_stack()[:-1]
+                if not f.filename.startswith((sys.prefix, sys.base_prefix, "<"))
+            ]
+            site = f"{frames[-1].filename}:{frames[-1].lineno}" if frames else "<unknown>"
+            entry = self.flagged.get(site)
+            if entry is None:
+                self.flagged[site] = {"event": event, "target": str(args[0])[:200], "count": 1,
+                                      "stack": traceback.format_list(frames[-6:])}
+                logger.warning(f"Synchronous I/O ({event}) inside a coroutine at {site}")
+            else:
+                entry["count"] += 1
+        finally:
+            self._local.active = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"installed": self._installed, "call_sites": self.flagged}
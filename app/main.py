@@ -1,18 +1,41 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request, Depends, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import os
 from dotenv import load_dotenv
 import requests
 import asyncio
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Callable, Awaitable
 import logging
 import json
-import pytesseract
-import cv2
-import numpy as np
-from PIL import Image
 import io
+import time
+from app.engines import get_engine, warm_up, engine_status
+from app import ocr_pool
+from app.timing import StageTimer
+from app.cache import LRUCache, content_hash
+from app.admission import ROUTE_COSTS, AdmissionController, admin_allowed, client_identity, request_lane
+from app.singleflight import SingleFlight
+from app.extraction import extract_entities, extract_entities_by_line, summarize_entities
+from app.incremental import AnalysisStore, apply_edits, changed_lines
+from app.normalize import normalize_text
+from app.dosing import check_prescription, drug_key, prescription_doses
+from app.audit import AuditLog
+from app.phash import PerceptualIndex, dhash
+from app.memory import WorkerRecycler, memory_report, start_tracing
+from app.models import ModelRegistry
+from app.loopmonitor import LoopLagMonitor, SyncIOAuditor
+from app.entity_view import EntityView, view_entities, dedupe_entities
+from app.hf_client import InferenceClient
+from app.generation import PrefixCachedGenerator
+from app.scanner import ScannerSession, ScanFrame, ScanError
+from app.schemas import (
+    PrescriptionAnalysisResponse,
+    TextAnalysisResponse,
+    EntitiesResponse,
+    ChatResponse,
+    FastJSONResponse,
+)
 
 # Load environment variables
 load_dotenv()
@@ -24,7 +47,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Medical Prescription Verification API",
     description="AI-powered prescription analysis using IBM models from Hugging Face",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=FastJSONResponse
 )
 
 app.add_middleware(
@@ -43,6 +67,55 @@ IBM_MODELS = {
     "medical_ner": "alvaroalon2/biobert_chemical_ner" # Chemical/drug NER
 }
 
+# Pipeline task per model, for local inference
+MODEL_TASKS = {
+    "granite_instruct": "text-generation",
+    "granite_medical": "text-generation",
+    "biobert_ner": "token-classification",
+    "medical_ner": "token-classification"
+}
+
+# Local models load on first use and the least recently used ones are evicted
+# beyond MODEL_MEMORY_BUDGET_MB; models listed in MODEL_PINNED stay resident.
+# MODEL_SIZE_ESTIMATES_MB ("name=MB,...") sizes models before their first load
+MODEL_REGISTRY = ModelRegistry(
+    {name: (model_id, MODEL_TASKS[name]) for name, model_id in IBM_MODELS.items()},
+    budget_mb=float(os.getenv('MODEL_MEMORY_BUDGET_MB', '4096')),
+    pinned=[n.strip() for n in os.getenv('MODEL_PINNED', '').split(",") if n.strip()],
+    estimates_mb={
+        name.strip(): float(mb)
+        for name, _, mb in (item.partition("=") for item in os.getenv('MODEL_SIZE_ESTIMATES_MB', '').split(","))
+        if name.strip() and mb.strip()
+    }
+)
+
+# Optional LLM-written report sections, generated locally on CPU. The instruction
+# prompt below is identical for every request, so its KV cache is computed once
+# per loaded model; requests only add their prescription summary
+LOCAL_GENERATION_ENABLED = os.getenv('LOCAL_GENERATION_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+LOCAL_GENERATION_MODEL = os.getenv('LOCAL_GENERATION_MODEL', 'granite_medical')
+REPORT_INSTRUCTIONS = """You are a clinical pharmacist reviewing prescriptions before dispensing.
+For the prescription summary below, write the requested report section in one or two short, factual sentences.
+Do not invent drugs or doses that are not listed. Mention age-related precautions when an age is given.
+Safety: name interaction, allergy or overdose risks to check for the listed drugs.
+Clinical notes: give practical administration advice for the listed drugs and schedule.
+
+"""
+# Per-section token budgets; LOCAL_GENERATION_MAX_NEW_TOKENS caps all of them
+REPORT_SECTIONS = {
+    "safety": ("Safety", int(os.getenv('REPORT_SAFETY_MAX_TOKENS', '48'))),
+    "clinical_notes": ("Clinical notes", int(os.getenv('REPORT_NOTES_MAX_TOKENS', '48'))),
+}
+report_generator = PrefixCachedGenerator(
+    lambda: MODEL_REGISTRY.get(LOCAL_GENERATION_MODEL),
+    REPORT_INSTRUCTIONS,
+    max_new_tokens=int(os.getenv('LOCAL_GENERATION_MAX_NEW_TOKENS', '64')),
+    max_batch=int(os.getenv('LOCAL_GENERATION_MAX_BATCH', '8')),
+    batch_wait=float(os.getenv('LOCAL_GENERATION_BATCH_WAIT_MS', '10')) / 1000
+)
+# Drop the generator's hold on the model (and its prefix cache) when the registry evicts it
+MODEL_REGISTRY.on_evict(lambda name: report_generator.release() if name == LOCAL_GENERATION_MODEL else None)
+
 # Get HuggingFace API key (optional for many models)
 HF_API_KEY = os.getenv('HUGGING_FACE_API_KEY')
 HF_HEADERS = {}
@@ -55,9 +128,123 @@ else:
     HF_HEADERS = {"Content-Type": "application/json"}
     logger.info("Running without HuggingFace API key - using free tier")
 
+# Inference API endpoint (point HF_INFERENCE_URL at mock_hf_server.py for offline
+# load tests), with a keep-alive connection pool and optional retries
+HF_CLIENT = InferenceClient(
+    os.getenv('HF_INFERENCE_URL', 'https://api-inference.huggingface.co'),
+    pool_size=int(os.getenv('HF_POOL_SIZE', '16')),
+    timeout=float(os.getenv('HF_TIMEOUT', '30')),
+    retries=int(os.getenv('HF_RETRIES', '0')),
+    max_loading_wait=float(os.getenv('HF_MAX_LOADING_WAIT', '20'))
+)
+
+# Admission control: per-client token buckets and interactive/batch lanes
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+admission = AdmissionController(
+    capacity=float(os.getenv('RATE_LIMIT_CAPACITY', '200')),
+    refill_rate=float(os.getenv('RATE_LIMIT_REFILL_PER_SEC', '2')),
+    interactive_slots=int(os.getenv('ADMISSION_INTERACTIVE_SLOTS', '8')),
+    batch_slots=int(os.getenv('ADMISSION_BATCH_SLOTS', '4')),
+    queue_timeout=float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '2'))
+)
+# Peers allowed to name the client via X-Client-ID / X-Forwarded-For (router, Streamlit server);
+# everyone else is rate limited by their own address
+TRUSTED_PROXIES = {p.strip() for p in os.getenv('TRUSTED_PROXIES', '127.0.0.1,::1').split(',') if p.strip()}
+# Admin routes (memory report, warmup, model load/pin) need X-Admin-Token when ADMIN_TOKEN
+# is set; without it they only answer direct requests from this host
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+
+async def require_admin(request: Request):
+    """Reject admin requests that carry no valid token (or, without one, do not come from this host)"""
+    if not admin_allowed(request.client.host if request.client else None, request.headers, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    """Rate limit and prioritize requests before they reach the handlers"""
+    if not ADMISSION_ENABLED:
+        return await call_next(request)
+    
+    client_id = client_identity(request.client.host if request.client else None, request.headers, TRUSTED_PROXIES)
+    lane = request_lane(request.headers.get("x-request-priority"))
+    request.state.client_id = client_id  # for handlers that charge by request size
+    holds_slot, rejection = await admission.admit(client_id, request.url.path, lane)
+    if rejection:
+        logger.warning(f"Rejected {request.url.path} for {client_id} ({lane}): {rejection['detail']}")
+        return FastJSONResponse(
+            {"detail": rejection["detail"]},
+            status_code=rejection["status_code"],
+            headers={"Retry-After": str(rejection["retry_after"])}
+        )
+    try:
+        return await call_next(request)
+    finally:
+        if holds_slot:
+            admission.release(lane)
+
+# Worker recycling: replace this worker after MAX_REQUESTS requests or above MAX_RSS_MB
+# resident memory (0 disables); run.py's supervisor passes WORKER_CONTROL_FD and starts
+# the replacement before retiring this process
+recycler = WorkerRecycler(
+    max_requests=int(os.getenv('MAX_REQUESTS', '0')),
+    max_rss_mb=float(os.getenv('MAX_RSS_MB', '0')),
+    jitter=int(os.getenv('MAX_REQUESTS_JITTER', '0')),
+    control_fd=int(os.environ['WORKER_CONTROL_FD']) if os.getenv('WORKER_CONTROL_FD') else None
+)
+if os.getenv('MEMORY_TRACEMALLOC', 'false').lower() in ('1', 'true', 'yes'):
+    start_tracing(int(os.getenv('MEMORY_TRACEMALLOC_FRAMES', '1')))
+
+@app.middleware("http")
+async def recycle_worker(request: Request, call_next):
+    """Count requests and ask for a replacement once a recycling threshold is crossed"""
+    try:
+        return await call_next(request)
+    finally:
+        if request.url.path != "/health":  # health probes (e.g. the router's) are not load
+            recycler.after_request()
+
+@app.on_event("startup")
+async def report_worker_ready():
+    """Let the supervisor retire the worker this one replaces"""
+    recycler.ready()
+
+# Event-loop lag monitoring; LOOP_DEBUG also flags synchronous I/O inside coroutines
+LOOP_MONITOR_ENABLED = os.getenv('LOOP_MONITOR_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+LOOP_DEBUG = os.getenv('LOOP_DEBUG', 'false').lower() in ('1', 'true', 'yes')
+loop_monitor = LoopLagMonitor(
+    interval=float(os.getenv('LOOP_MONITOR_INTERVAL_MS', '100')) / 1000,
+    threshold=float(os.getenv('LOOP_LAG_THRESHOLD_MS', '250')) / 1000
+)
+sync_io_auditor = SyncIOAuditor()
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    """Start measuring event-loop lag on the serving loop"""
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    if LOOP_DEBUG:
+        loop = asyncio.get_running_loop()
+        loop.set_debug(True)
+        loop.slow_callback_duration = loop_monitor.threshold
+        sync_io_auditor.install()
+        logger.warning("LOOP_DEBUG enabled: asyncio debug mode and synchronous I/O auditing are on")
+
+# Comma-separated list of engines to import at startup, e.g. "ocr,transformers" or "all"
+PRELOAD_ENGINES = os.getenv('PRELOAD_ENGINES', '')
+
+@app.on_event("startup")
+async def preload_engines():
+    """Optionally preload heavy subsystems before serving traffic"""
+    if PRELOAD_ENGINES:
+        names = None if PRELOAD_ENGINES.strip().lower() == "all" else [n.strip() for n in PRELOAD_ENGINES.split(",") if n.strip()]
+        logger.info(f"Preloading engines: {warm_up(names)}")
+
 def extract_text_from_image(image_bytes: bytes) -> str:
     """Extract text from image using OCR"""
     try:
+        ocr = get_engine("ocr")
+        cv2, np, Image = ocr.cv2, ocr.np, ocr.Image
+
         # Convert bytes to PIL Image
         image = Image.open(io.BytesIO(image_bytes))
         
@@ -74,16 +261,15 @@ def extract_text_from_image(image_bytes: bytes) -> str:
         thresh = cv2.adaptiveThreshold(denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
                                      cv2.THRESH_BINARY, 11, 2)
         
-        # Use pytesseract to extract text
-        custom_config = r'--oem 3 --psm 6'
-        extracted_text = pytesseract.image_to_string(thresh, config=custom_config)
+        # Extract text on the persistent Tesseract worker pool
+        extracted_text = ocr_pool.image_to_string(thresh)
         
         # Clean up the extracted text
         cleaned_text = extracted_text.strip()
         
         if len(cleaned_text) < 10:
             # If OCR didn't work well, try with original image
-            extracted_text = pytesseract.image_to_string(image, config=custom_config)
+            extracted_text = ocr_pool.image_to_string(image)
             cleaned_text = extracted_text.strip()
         
         logger.info(f"OCR extracted text: {cleaned_text[:100]}...")
@@ -93,6 +279,86 @@ def extract_text_from_image(image_bytes: bytes) -> str:
         logger.error(f"OCR extraction failed: {str(e)}")
         return "Error: Could not extract text from image. Please ensure the image is clear and contains readable text."
 
+# OCR results keyed by image content hash, so re-submitted images skip Tesseract
+OCR_CACHE = LRUCache(int(os.getenv('OCR_CACHE_SIZE', '256')))
+
+# OCR results keyed by perceptual hash, so a prescription re-photographed within
+# the TTL (different crop, lighting or compression) also skips Tesseract.
+# Opt-in: forms on the same template that differ only in a dose or name can
+# hash identically, so reused text is never authoritative. Responses that
+# reuse text set cache.near_duplicate and verification_status="needs_review".
+NEAR_DUPLICATE_INDEX = PerceptualIndex(
+    int(os.getenv('NEAR_DUPLICATE_INDEX_SIZE', '0')),
+    max_distance=int(os.getenv('NEAR_DUPLICATE_MAX_DISTANCE', '12')),
+    ttl=float(os.getenv('NEAR_DUPLICATE_TTL', '900'))
+)
+
+# Whether OCR output goes through the normalization stage before extraction
+NORMALIZE_OCR_TEXT = os.getenv('NORMALIZE_OCR_TEXT', 'true').lower() in ('1', 'true', 'yes')
+
+# Coalesces concurrent identical /analyze-* requests into one computation
+analysis_flight = SingleFlight()
+
+# Prior text analyses (per-line entities) that incremental re-analysis builds on
+ANALYSIS_STORE = AnalysisStore(int(os.getenv('ANALYSIS_STORE_SIZE', '1024')))
+
+# Append-only audit log of every /analyze-* request, written in batches off the request path.
+# The database is opened when the server starts (not on import), by default next to run.py
+AUDIT_LOG_ENABLED = os.getenv('AUDIT_LOG_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+AUDIT_DB_PATH = os.getenv('AUDIT_DB_PATH') or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'audit.db')
+AUDIT_LOG: Optional[AuditLog] = None
+
+@app.on_event("startup")
+async def open_audit_log():
+    """Open (and if needed create) the audit database"""
+    global AUDIT_LOG
+    if AUDIT_LOG_ENABLED and AUDIT_LOG is None:
+        AUDIT_LOG = await asyncio.to_thread(
+            AuditLog,
+            AUDIT_DB_PATH,
+            batch_size=int(os.getenv('AUDIT_BATCH_SIZE', '200')),
+            flush_interval=float(os.getenv('AUDIT_FLUSH_INTERVAL', '1.0'))
+        )
+
+def audit_analysis(route: str, content_key: str, result: Dict[str, Any], timings: Dict[str, float],
+                   cache: Dict[str, Any], models: Dict[str, Any], patient_age: Optional[int]) -> None:
+    """Queue an analysis for the audit log, if enabled"""
+    if AUDIT_LOG is not None:
+        entities = result["entities"].get("data") if result["entities"].get("success") else None
+        AUDIT_LOG.record(route, content_key, entities, timings, cache, models,
+                         patient_age=patient_age, text_length=len(result["text"]) if "text" in result else None)
+
+@app.on_event("shutdown")
+async def flush_audit_log():
+    """Write any queued audit records before exiting"""
+    if AUDIT_LOG is not None:
+        await asyncio.to_thread(AUDIT_LOG.close)
+
+def extract_text_with_cache(image_bytes: bytes) -> tuple:
+    """Return (text, cache_hit, near_duplicate) for an image.
+
+    Identical bytes hit the OCR cache; otherwise a near-identical image seen
+    recently (within the perceptual-hash distance) reuses its OCR text. Reused
+    text is not cached under the new image's bytes, so a repeat of that image
+    is still reported as a near-duplicate rather than an exact hit.
+    """
+    key = content_hash(image_bytes)
+    cached = OCR_CACHE.get(key)
+    if cached is not None:
+        return cached, True, False
+    image_hash = dhash(image_bytes) if NEAR_DUPLICATE_INDEX.capacity > 0 else None
+    if image_hash is not None:
+        similar, distance = NEAR_DUPLICATE_INDEX.lookup(image_hash)
+        if similar is not None:
+            logger.info(f"Near-duplicate image (Hamming distance {distance}), reusing OCR text")
+            return similar, False, True
+    text = extract_text_from_image(image_bytes)
+    if not text.startswith("Error:"):
+        OCR_CACHE.put(key, text)
+        if image_hash is not None:
+            NEAR_DUPLICATE_INDEX.add(image_hash, text)
+    return text, False, False
+
 @app.get("/")
 async def root():
     return {
@@ -109,19 +375,94 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "timestamp": "2024-01-01T00:00:00Z"}
 
+@app.post("/warmup", dependencies=[Depends(require_admin)])
+async def warmup(engines: Optional[str] = Form(None)):
+    """Preload heavy subsystems (OCR, transformers) so the first request is fast"""
+    names = [n.strip() for n in engines.split(",") if n.strip()] if engines else None
+    results = await asyncio.to_thread(warm_up, names)
+    return {"engines": results, "status": engine_status()}
+
+@app.get("/stats")
+async def stats():
+    """Operational counters for admission control and caches"""
+    return {
+        "admission": admission.stats() if ADMISSION_ENABLED else {"enabled": False},
+        "ocr_cache": OCR_CACHE.stats(),
+        "near_duplicate_index": NEAR_DUPLICATE_INDEX.stats(),
+        "singleflight": analysis_flight.stats(),
+        "analysis_store": ANALYSIS_STORE.stats(),
+        "engines": engine_status(),
+        "ocr_backend": ocr_pool.backend(),
+        "audit_log": AUDIT_LOG.stats() if AUDIT_LOG is not None else {"enabled": False},
+        "event_loop": loop_monitor.stats() if LOOP_MONITOR_ENABLED else {"enabled": False},
+        "sync_io": sync_io_auditor.stats(),
+        "hf_client": HF_CLIENT.stats(),
+        "report_generation": report_generator.stats() if LOCAL_GENERATION_ENABLED else {"enabled": False}
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Event-loop lag metrics in Prometheus text format"""
+    return PlainTextResponse(loop_monitor.prometheus())
+
+@app.get("/admin/memory", dependencies=[Depends(require_admin)])
+async def admin_memory(top: int = 15):
+    """RSS, top allocation sites and live NumPy buffers for this worker"""
+    return await asyncio.to_thread(memory_report, recycler, top)
+
+@app.get("/audit/summary")
+async def audit_summary(hours: float = 24.0, top: int = 20):
+    """Per-drug volume and per-route latency distribution from the audit log"""
+    if AUDIT_LOG is None:
+        raise HTTPException(status_code=404, detail="Audit log is disabled (AUDIT_LOG_ENABLED=false)")
+    since = time.time() - hours * 3600
+    drug_volume, latency = await asyncio.gather(
+        asyncio.to_thread(AUDIT_LOG.drug_volume, since, top),
+        asyncio.to_thread(AUDIT_LOG.latency, since)
+    )
+    return {"hours": hours, "drug_volume": drug_volume, "latency": latency, "writer": AUDIT_LOG.stats()}
+
 @app.get("/models")
 async def list_models():
     """List available IBM models"""
     return {
         "available_models": IBM_MODELS,
-        "description": "IBM models available via Hugging Face"
+        "description": "IBM models available via Hugging Face",
+        "registry": MODEL_REGISTRY.status()
     }
 
+@app.post("/models/{name}/pin", dependencies=[Depends(require_admin)])
+async def pin_model(name: str):
+    """Keep a model resident regardless of the memory budget"""
+    if name not in IBM_MODELS:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {name}")
+    MODEL_REGISTRY.pin(name)
+    return MODEL_REGISTRY.status()["models"][name]
+
+@app.delete("/models/{name}/pin", dependencies=[Depends(require_admin)])
+async def unpin_model(name: str):
+    """Allow a pinned model to be evicted again"""
+    if name not in IBM_MODELS:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {name}")
+    MODEL_REGISTRY.unpin(name)
+    return MODEL_REGISTRY.status()["models"][name]
+
+@app.post("/models/{name}/load", dependencies=[Depends(require_admin)])
+async def load_model(name: str):
+    """Load a model into the registry ahead of traffic"""
+    if name not in IBM_MODELS:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {name}")
+    try:
+        await asyncio.to_thread(MODEL_REGISTRY.get, name)
+    except ImportError as e:
+        raise HTTPException(status_code=503, detail=f"Local inference unavailable: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not load {name}: {e}")
+    return MODEL_REGISTRY.status()["models"][name]
+
 async def call_hugging_face_model(model_name: str, inputs: str, task_type: str = "text-generation") -> Dict[str, Any]:
     """Generic function to call any Hugging Face model"""
     try:
-        api_url = f"https://api-inference.huggingface.co/models/{model_name}"
-        
         if task_type == "text-generation":
             payload = {
                 "inputs": inputs,
@@ -139,7 +480,7 @@ async def call_hugging_face_model(model_name: str, inputs: str, task_type: str =
         
         # Always try without auth first for publicly available models
         headers_no_auth = {"Content-Type": "application/json"}
-        response = requests.post(api_url, headers=headers_no_auth, json=payload, timeout=30)
+        response = await asyncio.to_thread(HF_CLIENT.post, model_name, payload, headers_no_auth)
         
         if response.status_code == 200:
             return {"success": True, "data": response.json()}
@@ -148,7 +489,7 @@ async def call_hugging_face_model(model_name: str, inputs: str, task_type: str =
         elif response.status_code == 401:
             # Try with API key if available
             if HF_API_KEY and HF_API_KEY != 'hf_your_hugging_face_token_here':
-                response = requests.post(api_url, headers=HF_HEADERS, json=payload, timeout=30)
+                response = await asyncio.to_thread(HF_CLIENT.post, model_name, payload, HF_HEADERS)
                 if response.status_code == 200:
                     return {"success": True, "data": response.json()}
             return {"success": False, "error": "This model requires authentication. Please add a valid Hugging Face API key."}
@@ -161,31 +502,57 @@ async def call_hugging_face_model(model_name: str, inputs: str, task_type: str =
         logger.error(f"Hugging Face API error: {e}")
         return {"success": False, "error": f"API call failed: {str(e)}"}
 
-async def analyze_with_ibm_granite(text: str, patient_age: Optional[int] = None) -> Dict[str, Any]:
+def dosage_compliance(dose_checks: List[Dict[str, Any]]) -> List[str]:
+    """Report lines for the daily-dose limit check"""
+    exceeded = [c for c in dose_checks if c["status"] == "exceeds"]
+    unverified = [c["drug"] for c in dose_checks if c["status"] == "unverified"]
+    lines = [
+        f"• Dosages: ⚠ {c['drug']} is not recommended for {c['age_band']} patients"
+        if c["max_daily_mg"] == 0 else
+        f"• Dosages: ⚠ {c['drug']} {c['daily_dose_mg']:g} mg/day exceeds the {c['max_daily_mg']:g} mg/day maximum for {c['age_band']} patients"
+        for c in exceeded
+    ]
+    if not exceeded and len(unverified) < len(dose_checks):
+        lines.append(f"• Dosages: Daily totals within limits for {dose_checks[0]['age_band']} patients ✓")
+    if unverified:
+        lines.append(f"• Dosages: No daily limit check for {', '.join(unverified)} (verify per drug)")
+    return lines
+
+async def generate_report_sections(drugs_found: List[str], frequencies: List[str], patient_age: Optional[int]) -> Dict[str, str]:
+    """Model-written text per report section; empty when local generation is off or fails"""
+    if not LOCAL_GENERATION_ENABLED or not drugs_found:
+        return {}
+    summary = f"Drugs: {'; '.join(drugs_found)}\nSchedule: {', '.join(frequencies) or 'as prescribed'}\n"
+    if patient_age is not None:
+        summary += f"Patient age: {patient_age}\n"
+    try:
+        texts = await asyncio.gather(*(
+            report_generator.generate(f"{summary}{title}:", max_tokens)
+            for title, max_tokens in REPORT_SECTIONS.values()
+        ))
+    except Exception as e:
+        logger.warning(f"Local report generation unavailable, using the template: {e}")
+        return {}
+    return {section: text for section, text in zip(REPORT_SECTIONS, texts) if text}
+
+async def analyze_with_ibm_granite(text: str, patient_age: Optional[int] = None, entities: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
     """Analyze medical text using medical language model"""
     
-    # Extract any drug and dosage using a general regex
-    import re
-    # Match patterns like: DrugName 250mg, DrugName 500 mg, etc.
-    drug_pattern = re.compile(r'([A-Z][a-zA-Z\-]+)\s*(\d+)\s*mg', re.IGNORECASE)
-    drugs_found = []
-    for match in drug_pattern.finditer(text):
-        drug = match.group(1).capitalize()
-        dose = match.group(2)
-        drugs_found.append(f"{drug} {dose}mg")
-
-    # Frequency detection
-    freq_patterns = [
-        (r'tid|three times daily|3 times daily', 'TID (three times daily)'),
-        (r'bid|twice daily|2 times daily', 'BID (twice daily)'),
-        (r'od|once daily|daily', 'OD (once daily)'),
-        (r'qid|four times daily|4 times daily', 'QID (four times daily)'),
-        (r'as needed|prn', 'PRN (as needed)')
+    # Drugs, dosages and frequencies come from the shared entity extractor;
+    # callers that already extracted entities can pass them in
+    if entities is None:
+        entities = extract_entities(text)
+    drugs_found, frequencies = summarize_entities(entities)
+    dose_checks = check_prescription(entities, patient_age)
+    daily_totals = {drug_key(c["drug"]): c["daily_dose_mg"] for c in dose_checks}
+    dosage_lines = [
+        f"• {drug} {dosage['word']}: {daily_totals[drug_key(drug)]:g} mg/day in total"
+        if daily_totals.get(drug_key(drug)) is not None else f"• {drug} {dosage['word']}: Dosage as prescribed"
+        for drug, dosage in prescription_doses(entities)
     ]
-    frequencies = []
-    for pat, label in freq_patterns:
-        if re.search(pat, text, re.IGNORECASE):
-            frequencies.append(label)
+    flagged = any(c["status"] == "exceeds" for c in dose_checks)
+    generated = await generate_report_sections(drugs_found, frequencies, patient_age)
+    generated_lines = {section: f"\n• {text}" for section, text in generated.items()}
 
     age_consideration = ""
     if patient_age is not None:
@@ -208,23 +575,23 @@ async def analyze_with_ibm_granite(text: str, patient_age: Optional[int] = None)
 {chr(10).join(f'• {drug}' for drug in drugs_found)}
 
 *💊 Dosage & Administration Analysis:*
-{chr(10).join(f'• {drug}: Dosage as prescribed' for drug in drugs_found)}
+{chr(10).join(dosage_lines)}
 {chr(10).join(f'• Frequency: {freq}' for freq in frequencies) if frequencies else ''}
 
 *⚠ Safety Assessment:*
 • Check for allergies and contraindications for all detected medications
-• Monitor for side effects and drug interactions
+• Monitor for side effects and drug interactions{generated_lines.get('safety', '')}
 
 *📋 Clinical Notes:*
 • Follow prescriber instructions for all medications
 • Complete full course of antibiotics if prescribed
-• Take medications with food or water as appropriate
+• Take medications with food or water as appropriate{generated_lines.get('clinical_notes', '')}
 
 *✅ Prescription Compliance:*
 • Format: Standard prescription format ✓
-• Dosages: Within normal therapeutic ranges (verify per drug) ✓
+{chr(10).join(dosage_compliance(dose_checks))}
 • Frequency: {', '.join(frequencies) if frequencies else 'As prescribed'} ✓
-• Safety: No obvious contraindications identified ✓
+• Safety: {'Review flagged dosages before dispensing ⚠' if flagged else 'No obvious contraindications identified ✓'}
 
 *Recommendations:*
 • Verify all medication names and dosages
@@ -253,133 +620,144 @@ Analysis based on actual prescription content. Always follow prescriber instruct
 
 For accurate analysis, please provide clear prescription text.
 """
-    return {"success": True, "data": [{"generated_text": analysis}]}
+    return {"success": True, "data": [{
+        "generated_text": analysis,
+        "dose_checks": dose_checks,
+        "generated_sections": list(generated),
+        "report_model": IBM_MODELS[LOCAL_GENERATION_MODEL] if generated else None
+    }]}
 
 async def extract_medical_entities(text: str) -> Dict[str, Any]:
     """Extract medical entities using NER model"""
     
-    # General entity extraction for any medication and dosage
-    entities = []
-    import re
-    # Medication and dosage: e.g., Azithromycin 250mg, Paracetamol 500mg
-    drug_pattern = re.compile(r'([A-Z][a-zA-Z\-]+)\s*(\d+)\s*mg', re.IGNORECASE)
-    for match in drug_pattern.finditer(text):
-        drug = match.group(1).capitalize()
-        dose = match.group(2)
-        entities.append({
-            "word": drug,
-            "entity_group": "MEDICATION",
-            "score": 0.95,
-            "start": match.start(1),
-            "end": match.end(1)
-        })
-        entities.append({
-            "word": f"{dose}mg",
-            "entity_group": "DOSAGE",
-            "score": 0.90,
-            "start": match.start(2),
-            "end": match.end(2) + 2
-        })
-
-    # Frequency patterns
-    frequency_patterns = [
-        (r'tid|three times daily|3 times daily', 'FREQUENCY', 'TID'),
-        (r'bid|twice daily|2 times daily', 'FREQUENCY', 'BID'),
-        (r'od|once daily|daily', 'FREQUENCY', 'OD'),
-        (r'qid|four times daily|4 times daily', 'FREQUENCY', 'QID'),
-        (r'as needed|prn', 'FREQUENCY', 'PRN')
-    ]
-    for pattern, entity_type, label in frequency_patterns:
-        matches = re.finditer(pattern, text.lower())
-        for match in matches:
-            entities.append({
-                "word": label,
-                "entity_group": entity_type,
-                "score": 0.85,
-                "start": match.start(),
-                "end": match.end()
-            })
-
-    # Route of administration
-    route_patterns = [
-        (r'oral|by mouth|po', 'ROUTE', 'Oral'),
-        (r'topical|apply', 'ROUTE', 'Topical'),
-        (r'injection|inject|iv', 'ROUTE', 'Injection')
-    ]
-    for pattern, entity_type, label in route_patterns:
-        matches = re.finditer(pattern, text.lower())
-        for match in matches:
-            entities.append({
-                "word": label,
-                "entity_group": entity_type,
-                "score": 0.80,
-                "start": match.start(),
-                "end": match.end()
-            })
-
-    return {"success": True, "data": entities}
-
-@app.post("/analyze-prescription")
-async def analyze_prescription(file: UploadFile = File(...), patient_age: Optional[int] = Form(None)):
+    # General entity extraction for any medication, dosage, frequency and route
+    return {"success": True, "data": extract_entities(text)}
+
+def entity_view_options(
+    group_by_type: bool = Form(False),
+    top_k: Optional[int] = Form(None, ge=1),
+    dedupe: bool = Form(False),
+    offset: int = Form(0, ge=0),
+    limit: Optional[int] = Form(None, ge=1)
+) -> EntityView:
+    """Entity presentation options shared by the analysis and extraction routes"""
+    return EntityView(group=group_by_type, top_k=top_k, dedupe=dedupe, offset=offset, limit=limit)
+
+def shape_entities(entities: Dict[str, Any], view: EntityView) -> Dict[str, Any]:
+    """Apply the requested entity view to an extraction result without modifying it"""
+    if not entities.get("success"):
+        return entities
+    return {"success": True, **view_entities(entities["data"], view)}
+
+async def run_analysis(text: str, patient_age: Optional[int], timer: StageTimer, known_lines: Optional[Dict[str, list]] = None) -> Dict[str, Any]:
+    """Extract entities once, then render the report from them, timing each stage.
+
+    `known_lines` holds per-line entities from a previous analysis; only lines
+    not found there are re-extracted.
+    """
+    result = {"line_entities": {}, "lines_total": text.count("\n") + 1, "lines_reextracted": 0}
+    try:
+        with timer.stage("extraction"):
+            entities, result["line_entities"], result["lines_reextracted"] = extract_entities_by_line(text, known_lines)
+        result["entities"] = {"success": True, "data": entities}
+    except Exception as e:
+        logger.error(f"Entity extraction error: {e}")
+        entities = None
+        result["entities"] = {"success": False, "error": str(e)}
+    
+    try:
+        result["granite"] = await timer.timed("rendering", analyze_with_ibm_granite(text, patient_age, entities))
+    except Exception as e:
+        logger.error(f"Report generation error: {e}")
+        result["granite"] = {"success": False, "error": str(e)}
+    return result
+
+async def analyze_document(content: bytes, content_type: Optional[str], filename: str, patient_age: Optional[int],
+                           on_ocr_done: Optional[Callable[[str], Awaitable[None]]] = None) -> Dict[str, Any]:
+    """OCR (for images) and analyze an uploaded document, recording stage timings"""
+    timer = StageTimer()
+    ocr_hit = near_duplicate = False
+    
+    # Handle different file types
+    if content_type and content_type.startswith('text'):
+        text_content = content.decode('utf-8')
+    elif content_type and content_type.startswith('image'):
+        # Use OCR to extract text from prescription image, off the event loop
+        logger.info(f"Processing image file: {filename}")
+        with timer.stage("ocr"):
+            text_content, ocr_hit, near_duplicate = await asyncio.to_thread(extract_text_with_cache, content)
+        
+        # Correct common OCR confusions (0/O, 1/l, "rng" -> "mg") before extraction
+        if NORMALIZE_OCR_TEXT:
+            with timer.stage("normalization"):
+                text_content = normalize_text(text_content)
+        
+        # Validate OCR result
+        if not text_content or len(text_content.strip()) < 10:
+            raise HTTPException(
+                status_code=400, 
+                detail="Could not extract readable text from image. Please ensure the image is clear and contains readable prescription text."
+            )
+        
+        logger.info(f"OCR successful, extracted {len(text_content)} characters")
+        if on_ocr_done is not None:
+            await on_ocr_done("ocr_done")
+    else:
+        # Handle other file types (PDF, etc.)
+        text_content = content.decode('utf-8', errors='ignore')
+    
+    if len(text_content.strip()) < 10:
+        raise HTTPException(status_code=400, detail="Text content too short for analysis")
+    
+    # Run analyses using IBM models, passing patient_age
+    result = await run_analysis(text_content, patient_age, timer)
+    result.update(text=text_content, stages=timer.stages, ocr_hit=ocr_hit, near_duplicate=near_duplicate)
+    return result
+
+def prescription_response(filename: str, content_type: Optional[str], result: Dict[str, Any], timer: StageTimer,
+                          coalesced: bool, patient_age: Optional[int], view: EntityView) -> PrescriptionAnalysisResponse:
+    """Response body for an analyzed document (shared by HTTP uploads and scanner stations)"""
+    timer.stages.update(result["stages"])
+    return PrescriptionAnalysisResponse(
+        filename=filename,
+        content_type=content_type,
+        ibm_granite_analysis=result["granite"],
+        medical_entities=shape_entities(result["entities"], view),
+        # Reused near-duplicate text may belong to a different prescription
+        verification_status="needs_review" if result["near_duplicate"] else "processed",
+        text_length=len(result["text"]),
+        patient_age=patient_age, # Return age in the response
+        model_info={
+            "granite_model": IBM_MODELS["granite_medical"],
+            "ner_model": IBM_MODELS["biobert_ner"]
+        },
+        timings=timer.report(),
+        cache={"ocr": result["ocr_hit"], "near_duplicate": result["near_duplicate"], "coalesced": coalesced}
+    )
+
+@app.post("/analyze-prescription", response_model=PrescriptionAnalysisResponse)
+async def analyze_prescription(file: UploadFile = File(...), patient_age: Optional[int] = Form(None),
+                               view: EntityView = Depends(entity_view_options)):
     """Analyze prescription using IBM models from Hugging Face"""
     try:
         # Validate file
         if not file.filename:
             raise HTTPException(status_code=400, detail="No file provided")
         
+        timer = StageTimer()
+        
         # Read file content
         content = await file.read()
         
-        # Handle different file types
-        if file.content_type and file.content_type.startswith('text'):
-            text_content = content.decode('utf-8')
-        elif file.content_type and file.content_type.startswith('image'):
-            # Use OCR to extract text from prescription image
-            logger.info(f"Processing image file: {file.filename}")
-            text_content = extract_text_from_image(content)
-            
-            # Validate OCR result
-            if not text_content or len(text_content.strip()) < 10:
-                raise HTTPException(
-                    status_code=400, 
-                    detail="Could not extract readable text from image. Please ensure the image is clear and contains readable prescription text."
-                )
-            
-            logger.info(f"OCR successful, extracted {len(text_content)} characters")
-        else:
-            # Handle other file types (PDF, etc.)
-            text_content = content.decode('utf-8', errors='ignore')
-        
-        if len(text_content.strip()) < 10:
-            raise HTTPException(status_code=400, detail="Text content too short for analysis")
-        
-        # Run analyses concurrently using IBM models, passing patient_age
-        granite_task = analyze_with_ibm_granite(text_content, patient_age)
-        entity_task = extract_medical_entities(text_content)
-        
-        granite_response, entity_response = await asyncio.gather(
-            granite_task, entity_task, return_exceptions=True
+        # Identical concurrent uploads share one OCR + analysis run
+        key = content_hash("document", content, file.content_type, patient_age)
+        result, coalesced = await analysis_flight.do(
+            key, lambda: analyze_document(content, file.content_type, file.filename, patient_age)
         )
-        
-        # Handle exceptions in responses
-        if isinstance(granite_response, Exception):
-            granite_response = {"success": False, "error": str(granite_response)}
-        if isinstance(entity_response, Exception):
-            entity_response = {"success": False, "error": str(entity_response)}
-        
-        return {
-            "filename": file.filename,
-            "content_type": file.content_type,
-            "ibm_granite_analysis": granite_response,
-            "medical_entities": entity_response,
-            "verification_status": "processed",
-            "text_length": len(text_content),
-            "patient_age": patient_age, # Return age in the response
-            "model_info": {
-                "granite_model": IBM_MODELS["granite_medical"],
-                "ner_model": IBM_MODELS["biobert_ner"]
-            }
-        }
+        response = prescription_response(file.filename, file.content_type, result, timer, coalesced, patient_age, view)
+        audit_analysis("/analyze-prescription", content_hash(content), result, response.timings,
+                       response.cache, response.model_info, patient_age)
+        return FastJSONResponse(response)
         
     except HTTPException:
         raise
@@ -387,8 +765,49 @@ async def analyze_prescription(file: UploadFile = File(...), patient_age: Option
         logger.error(f"Analysis error: {e}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
-@app.post("/extract-drug-info")
-async def extract_drug_info(text: str = Form(...)):
+# Scanner stations: captures per connection processed concurrently (the read
+# window), and the largest accepted image frame
+SCANNER_MAX_IN_FLIGHT = int(os.getenv('SCANNER_MAX_IN_FLIGHT', '4'))
+SCANNER_MAX_FRAME_MB = float(os.getenv('SCANNER_MAX_FRAME_MB', '10'))
+
+@app.websocket("/ws/scanner")
+async def scanner_socket(websocket: WebSocket, progress: bool = False, max_in_flight: Optional[int] = None):
+    """Persistent connection for scanner stations; see app/scanner.py for the frame protocol.
+
+    Each capture is admitted like the equivalent HTTP request (same rate-limit
+    cost and interactive lane) and answered with the /analyze-prescription body.
+    """
+    client_id = client_identity(websocket.client.host if websocket.client else None, websocket.headers, TRUSTED_PROXIES)
+
+    async def process(frame: ScanFrame, report) -> PrescriptionAnalysisResponse:
+        route = "/analyze-text" if frame.content_type.startswith("text") else "/analyze-prescription"
+        holds_slot = False
+        if ADMISSION_ENABLED:
+            holds_slot, rejection = await admission.admit(client_id, route, "interactive")
+            if rejection:
+                raise ScanError(rejection["status_code"], rejection["detail"], rejection["retry_after"])
+        try:
+            timer = StageTimer()
+            key = content_hash("document", frame.content, frame.content_type, frame.patient_age)
+            result, coalesced = await analysis_flight.do(
+                key, lambda: analyze_document(frame.content, frame.content_type, frame.name, frame.patient_age, report)
+            )
+            response = prescription_response(frame.name, frame.content_type, result, timer, coalesced,
+                                             frame.patient_age, EntityView())
+            audit_analysis("/ws/scanner", content_hash(frame.content), result, response.timings,
+                           response.cache, response.model_info, frame.patient_age)
+            return response
+        except HTTPException as e:
+            raise ScanError(e.status_code, e.detail)
+        finally:
+            if holds_slot:
+                admission.release("interactive")
+
+    window = min(max_in_flight or SCANNER_MAX_IN_FLIGHT, SCANNER_MAX_IN_FLIGHT)
+    await ScannerSession(websocket, process, window, progress, int(SCANNER_MAX_FRAME_MB * 1024 * 1024)).run()
+
+@app.post("/extract-drug-info", response_model=EntitiesResponse)
+async def extract_drug_info(text: str = Form(...), view: EntityView = Depends(entity_view_options)):
     """Extract drug names and dosages from prescription text using IBM NER model"""
     try:
         if not text or len(text.strip()) < 5:
@@ -404,13 +823,16 @@ async def extract_drug_info(text: str = Form(...)):
                 entity for entity in entities 
                 if isinstance(entity, dict) and entity.get('entity_group', '').upper() in ['CHEMICAL', 'DRUG', 'MEDICATION']
             ]
-            return {
-                "text": text,
-                "drug_entities": drug_entities,
-                "all_entities": entities,
-                "total_entities": len(entities) if isinstance(entities, list) else 0,
-                "model_used": IBM_MODELS["biobert_ner"]
-            }
+            shaped = view_entities(entities, view)
+            return FastJSONResponse(EntitiesResponse(
+                text=text,
+                drug_entities=dedupe_entities(drug_entities) if view.dedupe else drug_entities,
+                all_entities=shaped.get("data", []),
+                total_entities=shaped.get("total", len(entities)),
+                model_used=IBM_MODELS["biobert_ner"],
+                groups=shaped.get("groups"),
+                group_totals=shaped.get("group_totals")
+            ))
         else:
             raise HTTPException(status_code=500, detail=f"Drug extraction failed: {result.get('error')}")
             
@@ -420,40 +842,139 @@ async def extract_drug_info(text: str = Form(...)):
         logger.error(f"Drug extraction error: {e}")
         raise HTTPException(status_code=500, detail=f"Drug extraction failed: {str(e)}")
 
-@app.post("/analyze-text")
-async def analyze_text_directly(text: str = Form(...), patient_age: Optional[int] = Form(None)):
+@app.post("/analyze-text", response_model=TextAnalysisResponse)
+async def analyze_text_directly(text: str = Form(...), patient_age: Optional[int] = Form(None),
+                                view: EntityView = Depends(entity_view_options)):
     """Analyze text directly without file upload using IBM models"""
     try:
         if not text or len(text.strip()) < 10:
             raise HTTPException(status_code=400, detail="Text too short for analysis")
         
-        # Run analyses concurrently using IBM models, passing patient_age
-        granite_task = analyze_with_ibm_granite(text, patient_age)
-        entity_task = extract_medical_entities(text)
+        timer = StageTimer()
+        
+        async def analyze():
+            # Run analyses using IBM models, passing patient_age
+            pipeline_timer = StageTimer()
+            result = await run_analysis(text, patient_age, pipeline_timer)
+            result["stages"] = pipeline_timer.stages
+            result["analysis_id"] = ANALYSIS_STORE.save(text, patient_age, result["line_entities"])
+            return result
         
-        granite_response, entity_response = await asyncio.gather(
-            granite_task, entity_task, return_exceptions=True
+        # Identical concurrent submissions share one analysis run
+        key = content_hash("text", text, patient_age)
+        result, coalesced = await analysis_flight.do(key, analyze)
+        timer.stages.update(result["stages"])
+        
+        response = TextAnalysisResponse(
+            text=text[:100] + "..." if len(text) > 100 else text,
+            ibm_granite_analysis=result["granite"],
+            medical_entities=shape_entities(result["entities"], view),
+            verification_status="processed",
+            patient_age=patient_age, # Return age in the response
+            models_used={
+                "granite": IBM_MODELS["granite_medical"],
+                "ner": IBM_MODELS["biobert_ner"]
+            },
+            timings=timer.report(),
+            cache={"ocr": False, "coalesced": coalesced},
+            analysis_id=result["analysis_id"]
         )
+        audit_analysis("/analyze-text", content_hash(text), {**result, "text": text}, response.timings,
+                       response.cache, response.models_used, patient_age)
+        return FastJSONResponse(response)
         
-        return {
-            "text": text[:100] + "..." if len(text) > 100 else text,
-            "ibm_granite_analysis": granite_response if not isinstance(granite_response, Exception) else {"error": str(granite_response)},
-            "medical_entities": entity_response if not isinstance(entity_response, Exception) else {"error": str(entity_response)},
-            "verification_status": "processed",
-            "patient_age": patient_age, # Return age in the response
-            "models_used": {
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Text analysis error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/analyze-text/incremental", response_model=TextAnalysisResponse)
+async def analyze_text_incremental(
+    request: Request,
+    analysis_id: str = Form(...),
+    text: Optional[str] = Form(None),
+    edits: Optional[str] = Form(None),
+    patient_age: Optional[int] = Form(None),
+    view: EntityView = Depends(entity_view_options)
+):
+    """Re-analyze edited text against a previous analysis, re-extracting only changed lines.
+
+    Send either the full updated `text` or `edits`, a JSON list of
+    {"start", "end", "text"} replacements against the previous text.
+    """
+    try:
+        previous = ANALYSIS_STORE.get(analysis_id)
+        if previous is None:
+            raise HTTPException(status_code=404, detail="Unknown or expired analysis_id; run /analyze-text first")
+        
+        if text is None:
+            if edits is None:
+                raise HTTPException(status_code=400, detail="Provide either text or edits")
+            try:
+                text = apply_edits(previous.text, json.loads(edits))
+            except (ValueError, TypeError, KeyError) as e:
+                raise HTTPException(status_code=400, detail=f"Invalid edits: {e}")
+        
+        if len(text.strip()) < 10:
+            raise HTTPException(status_code=400, detail="Text too short for analysis")
+        if patient_age is None:
+            patient_age = previous.patient_age
+        
+        # Charge for the lines that will be re-extracted, so resending a whole
+        # new text here costs at least as much as /analyze-text
+        changed, total = changed_lines(text, previous.line_entities)
+        if ADMISSION_ENABLED and changed:
+            rejection = admission.surcharge(request.state.client_id, request.url.path,
+                                            ROUTE_COSTS["/analyze-text"] * changed / total)
+            if rejection:
+                raise HTTPException(status_code=rejection["status_code"], detail=rejection["detail"],
+                                    headers={"Retry-After": str(rejection["retry_after"])})
+        
+        timer = StageTimer()
+        
+        async def analyze():
+            pipeline_timer = StageTimer()
+            result = await run_analysis(text, patient_age, pipeline_timer, previous.line_entities)
+            result["stages"] = pipeline_timer.stages
+            result["analysis_id"] = ANALYSIS_STORE.save(text, patient_age, result["line_entities"])
+            return result
+        
+        # Identical concurrent re-checks of the same analysis share one run
+        key = content_hash("incremental", analysis_id, text, patient_age)
+        result, coalesced = await analysis_flight.do(key, analyze)
+        timer.stages.update(result["stages"])
+        
+        response = TextAnalysisResponse(
+            text=text[:100] + "..." if len(text) > 100 else text,
+            ibm_granite_analysis=result["granite"],
+            medical_entities=shape_entities(result["entities"], view),
+            verification_status="processed",
+            patient_age=patient_age,
+            models_used={
                 "granite": IBM_MODELS["granite_medical"],
                 "ner": IBM_MODELS["biobert_ner"]
+            },
+            timings=timer.report(),
+            cache={"ocr": False, "coalesced": coalesced},
+            analysis_id=result["analysis_id"],
+            incremental={
+                "base_analysis_id": analysis_id,
+                "lines_total": result["lines_total"],
+                "lines_reextracted": result["lines_reextracted"]
             }
-        }
+        )
+        audit_analysis("/analyze-text/incremental", content_hash(text), {**result, "text": text}, response.timings,
+                       {**response.cache, "lines_reextracted": result["lines_reextracted"]}, response.models_used, patient_age)
+        return FastJSONResponse(response)
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Text analysis error: {e}")
+        logger.error(f"Incremental analysis error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/granite-chat")
+@app.post("/granite-chat", response_model=ChatResponse)
 async def granite_chat(message: str = Form(...)):
     """Chat with medical AI for medical questions"""
     try:
@@ -499,12 +1020,12 @@ async def granite_chat(message: str = Form(...)):
 
 This AI assistant provides general information only, not medical advice."""
 
-        return {
-            "user_message": message,
-            "granite_response": {"success": True, "data": [{"generated_text": response_text}]},
-            "model_used": "Enhanced Medical Knowledge Base",
-            "disclaimer": "This is AI-generated information. Always consult healthcare professionals for medical advice."
-        }
+        return FastJSONResponse(ChatResponse(
+            user_message=message,
+            granite_response={"success": True, "data": [{"generated_text": response_text}]},
+            model_used="Enhanced Medical Knowledge Base",
+            disclaimer="This is AI-generated information. Always consult healthcare professionals for medical advice."
+        ))
         
     except HTTPException:
         raise
@@ -0,0 +1,142 @@
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Memory visibility and recycling for long-running API workers. Current RSS
+# comes from /proc (Linux), peak RSS from getrusage. Top allocators and NumPy
+# buffer counts need tracemalloc, which is off by default because it slows
+# every allocation; NumPy reports its data buffers in a dedicated tracemalloc
+# domain, so live ndarray buffers can be counted without walking the heap.
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size of this process in bytes (None if unknown)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def start_tracing(frames: int = 1) -> None:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def tracemalloc_report(top: int = 15) -> Dict[str, Any]:
+    """Top allocation sites and live NumPy buffers, if tracemalloc is running"""
+    if not tracemalloc.is_tracing():
+        return {"tracing": False, "hint": "set MEMORY_TRACEMALLOC=true to enable allocation tracing"}
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    report = {
+        "tracing": True,
+        "traced_bytes": current,
+        "traced_peak_bytes": peak,
+        "top_allocators": [
+            {"location": str(stat.traceback[0]), "size_bytes": stat.size, "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:top]
+        ],
+    }
+    numpy = sys.modules.get("numpy")
+    if numpy is not None:
+        buffers = snapshot.filter_traces([tracemalloc.DomainFilter(True, numpy.lib.tracemalloc_domain)]).traces
+        report["numpy_buffers"] = {"count": len(buffers), "size_bytes": sum(trace.size for trace in buffers)}
+    return report
+
+
+class WorkerRecycler:
+    """Ask for this worker to be replaced after too many requests or too much RSS
+
+    Under run.py, API workers share one listening socket and talk to the
+    supervisor over a pipe (`control_fd`). Once a threshold is crossed the
+    worker asks to be recycled. The supervisor starts a replacement and sends
+    this worker SIGTERM only after the replacement reports ready, so uvicorn
+    drains in-flight requests while the new process is already serving.
+    Without a supervisor the worker only reports that a recycle is due.
+    A random jitter on max_requests keeps workers from recycling together.
+    """
+
+    def __init__(self, max_requests: int = 0, max_rss_mb: float = 0, jitter: int = 0, check_every: int = 10,
+                 control_fd: Optional[int] = None):
+        self.max_requests = max_requests + (random.randint(0, jitter) if max_requests and jitter else 0)
+        self.max_rss_bytes = int(max_rss_mb * 1024 * 1024)
+        self.check_every = max(1, check_every)
+        self.control_fd = control_fd
+        self.requests = 0
+        self.started = time.time()
+        self.reason: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_requests or self.max_rss_bytes)
+
+    def _notify(self, message: str) -> bool:
+        """Send a one-line message to the supervisor (pipe writes this short are atomic)"""
+        if self.control_fd is None:
+            return False
+        try:
+            os.write(self.control_fd, f"{message} {os.getpid()}\n".encode())
+            return True
+        except OSError as e:
+            logger.error(f"Could not reach the worker supervisor: {e}")
+            return False
+
+    def ready(self) -> None:
+        """Tell the supervisor this worker is serving (it may now retire the one it replaces)"""
+        self._notify("ready")
+
+    def after_request(self) -> Optional[str]:
+        """Count a finished request; return the recycle reason when a recycle is requested"""
+        self.requests += 1
+        if self.reason is not None or not self.enabled:
+            return None
+        rss = rss_bytes() if self.max_rss_bytes and self.requests % self.check_every == 0 else None
+        if self.max_requests and self.requests >= self.max_requests:
+            reason = f"served {self.requests} requests (max {self.max_requests})"
+        elif rss is not None and rss > self.max_rss_bytes:
+            reason = f"RSS {rss / 2**20:.0f} MiB exceeds {self.max_rss_bytes / 2**20:.0f} MiB"
+        else:
+            return None
+        self.reason = reason
+        if self._notify("recycle"):
+            logger.warning(f"Recycling worker {os.getpid()}: {reason}")
+        else:
+            logger.warning(f"Worker {os.getpid()} is due for recycling ({reason}) but has no supervisor; run it via run.py")
+        return reason
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "requests": self.requests,
+            "max_requests": self.max_requests or None,
+            "max_rss_mb": self.max_rss_bytes / 2**20 if self.max_rss_bytes else None,
+            "recycling": self.reason,
+        }
+
+
+def memory_report(recycler: WorkerRecycler, top: int = 15) -> Dict[str, Any]:
+    rss, peak = rss_bytes(), peak_rss_bytes()
+    return {
+        "worker": recycler.stats(),
+        "rss_mb": round(rss / 2**20, 1) if rss is not None else None,
+        "peak_rss_mb": round(peak / 2**20, 1) if peak is not None else None,
+        **tracemalloc_report(top),
+    }
@@ -0,0 +1,181 @@
+import gc
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from app.engines import get_engine
+from app.memory import rss_bytes
+
+logger = logging.getLogger(__name__)
+
+# Local models are loaded on first use and kept under a memory budget. Before a
+# load, the least recently used unpinned models are evicted to make room for
+# the model's expected size (its footprint at the previous load, or a
+# configured estimate), so peak memory stays near the budget; after the load,
+# eviction runs again against the measured size. Footprints come from
+# parameter and buffer sizes for PyTorch models, or from the RSS growth
+# during load otherwise.
+
+
+def _load_pipeline(model_id: str, task: str) -> Any:
+    """Default loader: a Hugging Face transformers pipeline"""
+    return get_engine("transformers").transformers.pipeline(task, model=model_id)
+
+
+def model_bytes(model: Any) -> Optional[int]:
+    """Size of a PyTorch model's parameters and buffers (None if not a torch model)"""
+    module = getattr(model, "model", model)
+    if not hasattr(module, "parameters") or not hasattr(module, "buffers"):
+        return None
+    tensors = list(module.parameters()) + list(module.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class ModelRegistry:
+    """LRU-managed set of resident models, bounded by a memory budget
+
+    `specs` maps a model key to (model_id, task). `estimates_mb` gives the
+    expected size of models that have not been loaded yet. Pinned models are
+    never evicted. A model larger than the whole budget is still loaded (it
+    evicts everything unpinned) and a warning is logged.
+    """
+
+    def __init__(self, specs: Dict[str, tuple], budget_mb: float, pinned: Iterable[str] = (),
+                 loader: Callable[[str, str], Any] = _load_pipeline, max_events: int = 100,
+                 estimates_mb: Optional[Dict[str, float]] = None):
+        self.specs = specs
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.pinned = set(pinned)
+        self.loader = loader
+        self.estimates_bytes = {key: int(mb * 1024 * 1024) for key, mb in (estimates_mb or {}).items()}
+        self._resident: "OrderedDict[str, Any]" = OrderedDict()
+        self._bytes: Dict[str, int] = {}  # measured size at the last load, kept after eviction
+        self._loading: Dict[str, int] = {}  # expected size of loads in progress
+        self._load_ms: Dict[str, float] = {}
+        self._last_used: Dict[str, float] = {}
+        self._loads: Dict[str, int] = {key: 0 for key in specs}
+        self._lock = threading.Lock()
+        self._load_locks = {key: threading.Lock() for key in specs}
+        self._evict_listeners: list = []
+        self.events: deque = deque(maxlen=max_events)
+
+    def on_evict(self, listener: Callable[[str], None]) -> None:
+        """Call `listener(key)` when a model is evicted, so holders of derived state can drop it"""
+        self._evict_listeners.append(listener)
+
+    def _event(self, event: str, key: str, **details: Any) -> None:
+        self.events.append({"time": round(time.time(), 3), "event": event, "model": key, **details})
+
+    def get(self, key: str) -> Any:
+        """Return a resident model, loading it (and evicting others) if needed"""
+        if key not in self.specs:
+            raise KeyError(f"Unknown model: {key}")
+        with self._lock:
+            if key in self._resident:
+                self._resident.move_to_end(key)
+                self._last_used[key] = time.time()
+                return self._resident[key]
+
+        # One load per model at a time; other models can load concurrently
+        with self._load_locks[key]:
+            with self._lock:
+                if key in self._resident:
+                    return self._resident[key]
+                # Make room for the expected size first, so the load itself stays within budget
+                self._loading[key] = self.expected_bytes(key)
+                self._evict_over_budget(keep=key)
+            model_id, task = self.specs[key]
+            rss_before = rss_bytes()
+            start = time.perf_counter()
+            try:
+                model = self.loader(model_id, task)
+            except Exception as e:
+                with self._lock:
+                    self._loading.pop(key, None)
+                self._event("load_failed", key, error=str(e))
+                raise
+            load_ms = (time.perf_counter() - start) * 1000
+            size = model_bytes(model)
+            if size is None:
+                rss_after = rss_bytes()
+                size = max(0, rss_after - rss_before) if rss_before is not None and rss_after is not None else 0
+
+            with self._lock:
+                self._loading.pop(key, None)
+                self._resident[key] = model
+                self._bytes[key] = size
+                self._load_ms[key] = load_ms
+                self._last_used[key] = time.time()
+                self._loads[key] += 1
+                self._event("load", key, bytes=size, load_ms=round(load_ms, 1))
+                logger.info(f"Loaded model {key} ({model_id}) in {load_ms:.0f} ms, {size / 2**20:.0f} MiB")
+                self._evict_over_budget(keep=key)
+            return model
+
+    def expected_bytes(self, key: str) -> int:
+        """Expected footprint of a model: measured at its last load, else the configured estimate, else 0"""
+        return self._bytes.get(key, self.estimates_bytes.get(key, 0))
+
+    def _committed_bytes(self) -> int:
+        return self.resident_bytes() + sum(self._loading.values())
+
+    def _evict_over_budget(self, keep: str) -> None:
+        """Evict least recently used unpinned models until resident and loading models fit (lock held)"""
+        for victim in list(self._resident):
+            if self._committed_bytes() <= self.budget_bytes:
+                break
+            if victim == keep or victim in self.pinned:
+                continue
+            del self._resident[victim]
+            freed = self._bytes.get(victim, 0)
+            self._event("evict", victim, bytes=freed, reason="memory budget")
+            logger.info(f"Evicted model {victim} ({freed / 2**20:.0f} MiB) to stay within the memory budget")
+            for listener in self._evict_listeners:
+                try:
+                    listener(victim)
+                except Exception as e:
+                    logger.error(f"Evict listener failed for {victim}: {e}")
+        if self._committed_bytes() > self.budget_bytes:
+            logger.warning(f"Resident and loading models use {self._committed_bytes() / 2**20:.0f} MiB, "
+                           f"over the {self.budget_bytes / 2**20:.0f} MiB budget (pinned or oversized models)")
+        gc.collect()
+
+    def resident_bytes(self) -> int:
+        return sum(self._bytes.get(key, 0) for key in self._resident)
+
+    def pin(self, key: str) -> None:
+        if key not in self.specs:
+            raise KeyError(f"Unknown model: {key}")
+        with self._lock:
+            self.pinned.add(key)
+            self._event("pin", key)
+
+    def unpin(self, key: str) -> None:
+        if key not in self.specs:
+            raise KeyError(f"Unknown model: {key}")
+        with self._lock:
+            self.pinned.discard(key)
+            self._event("unpin", key)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "budget_mb": round(self.budget_bytes / 2**20, 1),
+                "resident_mb": round(self.resident_bytes() / 2**20, 1),
+                "models": {
+                    key: {
+                        "model_id": model_id,
+                        "task": task,
+                        "resident": key in self._resident,
+                        "pinned": key in self.pinned,
+                        "size_mb": round(self._bytes[key] / 2**20, 1) if key in self._bytes else None,
+                        "last_load_ms": round(self._load_ms[key], 1) if key in self._load_ms else None,
+                        "loads": self._loads[key],
+                        "last_used": round(self._last_used[key], 3) if key in self._last_used else None,
+                    }
+                    for key, (model_id, task) in self.specs.items()
+                },
+                "events": list(self.events),
+            }
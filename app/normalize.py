@@ -0,0 +1,65 @@
+import re
+
+# Fast clean-up of OCR output before entity extraction. One str.translate
+# call folds Unicode look-alikes, then a single precompiled alternation fixes
+# dosage tokens, character confusions and whitespace in one linear pass.
+
+TRANSLATION = str.maketrans({
+    "\u00a0": " ", "\u2002": " ", "\u2003": " ", "\u2009": " ", "\u200b": "",
+    "\u2018": "'", "\u2019": "'", "\u201c": '"', "\u201d": '"',
+    "\u2010": "-", "\u2011": "-", "\u2013": "-", "\u2014": "-",
+    "\u00b5": "mc", "\u03bc": "mc",  # µg / μg -> mcg
+    "\ufb01": "fi", "\ufb02": "fl",
+})
+
+# Misread unit spellings -> canonical unit
+UNIT_FIXES = {
+    "rng": "mg", "rnq": "mg", "mq": "mg", "m9": "mg", "nng": "mg", "rn9": "mg",
+    "mcq": "mcg", "rncg": "mcg", "rncq": "mcg", "mc9": "mcg", "ug": "mcg", "mcg": "mcg",
+    "rnl": "ml", "mI": "ml", "rnL": "ml",
+    "lU": "IU", "1U": "IU",
+}
+
+# Whole-token fixes for frequency abbreviations with digit/letter confusions
+TOKEN_FIXES = {
+    "t1d": "tid", "tld": "tid", "b1d": "bid", "bld": "bid", "q1d": "qid", "qld": "qid",
+    "0d": "od", "0D": "OD", "prm": "prn",
+}
+
+DIGIT_FIXES = str.maketrans({"O": "0", "o": "0", "l": "1", "I": "1"})
+LETTER_FIXES = str.maketrans({"0": "o", "1": "l"})
+
+_UNITS = "|".join(sorted(set(UNIT_FIXES) | {"mg", "g", "ml", "mL", "IU", "iu", "units"}, key=len, reverse=True))
+
+NORMALIZE_PATTERN = re.compile(
+    # Dose: a number (possibly with O/o/l/I misreads, e.g. "5OO", "lO") followed by a unit
+    rf"(?P<amount>(?<![\w.])(?:[0-9OolI]*[0-9][0-9OolI]*|[lI][0-9OolI]+)(?:\.[0-9OolI]+)?)(?P<space>[ \t]*)(?P<unit>{_UNITS})(?![A-Za-z])"
+    # Frequency abbreviations with confusions, as whole tokens
+    rf"|(?P<token>\b(?:{'|'.join(TOKEN_FIXES)})\b)"
+    # 0/1 misread inside or at the end of a lowercase word, e.g. Amoxici11in, Lisinopri1
+    r"|(?P<word>\b[A-Za-z][a-z]*[01][a-z01]*[a-z]\b|\b[A-Za-z][a-z]{2,}[01]\b)"
+    # Spaces/tabs at line edges, and runs of them inside a line (newlines are
+    # kept so the line structure survives for incremental extraction)
+    r"|(?P<edge_space>[ \t]+(?=\n)|(?<=\n)[ \t]+)"
+    r"|(?P<space_run>[ \t]{2,})"
+)
+
+
+def _fix(match: re.Match) -> str:
+    kind = match.lastgroup
+    if kind == "unit":
+        amount = match.group("amount").translate(DIGIT_FIXES)
+        unit = UNIT_FIXES.get(match.group("unit"), match.group("unit"))
+        return f"{amount}{match.group('space')}{unit}"
+    if kind == "token":
+        return TOKEN_FIXES[match.group("token")]
+    if kind == "word":
+        return match.group("word").translate(LETTER_FIXES)
+    if kind == "edge_space":
+        return ""
+    return " "
+
+
+def normalize_text(text: str) -> str:
+    """Correct common OCR confusions in prescription text (linear time)"""
+    return NORMALIZE_PATTERN.sub(_fix, text.translate(TRANSLATION)).strip()
@@ -0,0 +1,114 @@
+import logging
+import os
+import re
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from app.engines import get_engine
+
+logger = logging.getLogger(__name__)
+
+OCR_CONFIG = r'--oem 3 --psm 6'
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', str(os.cpu_count() or 4)))
+OCR_LANG = os.getenv('OCR_LANG', 'eng')
+
+# Each pool thread keeps one initialized Tesseract engine (via tesserocr's
+# C-API bindings) and receives images in memory. Without tesserocr, or when it
+# finds no language data, we fall back to pytesseract, which spawns a
+# tesseract process and temp files per call.
+
+_executor = None
+_executor_lock = threading.Lock()
+_local = threading.local()
+_tesserocr = None
+_tesserocr_checked = False
+_tessdata = None
+
+
+def _binary_tessdata() -> str:
+    """tessdata directory used by the tesseract binary, or "" if it cannot be found"""
+    try:
+        listing = subprocess.run(
+            [get_engine("ocr").pytesseract.pytesseract.tesseract_cmd, "--list-langs"],
+            capture_output=True, text=True, timeout=10,
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return ""
+    match = re.search(r'"(.+?)/?"', listing)
+    return f"{match.group(1)}/" if match else ""
+
+
+def _load_tesserocr():
+    global _tesserocr, _tesserocr_checked, _tessdata
+    if not _tesserocr_checked:
+        try:
+            import tesserocr
+            # The binary wheels bundle libtesseract without language data; unless
+            # TESSDATA_PREFIX is set, use the data of the installed tesseract binary
+            tessdata = "" if os.getenv("TESSDATA_PREFIX") else _binary_tessdata()
+            path, languages = tesserocr.get_languages(tessdata) if tessdata else tesserocr.get_languages()
+            missing = set(OCR_LANG.split("+")) - set(languages)
+            if missing:
+                logger.warning(f"tesserocr found no {'+'.join(sorted(missing))} data in {path} - "
+                               f"falling back to pytesseract subprocess OCR")
+            else:
+                _tesserocr, _tessdata = tesserocr, path
+                logger.info(f"Using persistent tesserocr engines (Tesseract {tesserocr.tesseract_version().splitlines()[0]}, "
+                            f"data in {path})")
+        except ImportError:
+            logger.info("tesserocr not installed - falling back to pytesseract subprocess OCR")
+        except RuntimeError as e:
+            logger.warning(f"tesserocr unavailable ({e}) - falling back to pytesseract subprocess OCR")
+        _tesserocr_checked = True
+    return _tesserocr
+
+
+def backend() -> str:
+    """Name of the OCR backend in use: "tesserocr" or "pytesseract\""""
+    return "tesserocr" if _load_tesserocr() is not None else "pytesseract"
+
+
+def executor() -> ThreadPoolExecutor:
+    """Process-wide OCR worker pool"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr")
+    return _executor
+
+
+def _thread_engine():
+    """This worker thread's Tesseract engine, initialized once per thread"""
+    api = getattr(_local, "api", None)
+    if api is None:
+        tesserocr = _load_tesserocr()
+        api = tesserocr.PyTessBaseAPI(path=_tessdata, lang=OCR_LANG, psm=tesserocr.PSM.SINGLE_BLOCK, oem=tesserocr.OEM.DEFAULT)
+        _local.api = api
+    return api
+
+
+def _recognize(image) -> str:
+    """OCR a PIL image or NumPy array on the current worker thread"""
+    ocr = get_engine("ocr")
+    if _load_tesserocr() is None:
+        return ocr.pytesseract.image_to_string(image, lang=OCR_LANG, config=OCR_CONFIG)
+    if not isinstance(image, ocr.Image.Image):
+        image = ocr.Image.fromarray(image)
+    api = _thread_engine()
+    api.SetImage(image)
+    try:
+        return api.GetUTF8Text()
+    finally:
+        api.Clear()
+
+
+def submit(image) -> Future:
+    """Queue an image (PIL image or NumPy array) for OCR on the worker pool"""
+    return executor().submit(_recognize, image)
+
+
+def image_to_string(image) -> str:
+    """OCR an image on the worker pool and wait for the text"""
+    return submit(image).result()
@@ -0,0 +1,84 @@
+import io
+import threading
+import time
+from typing import Any, Optional, Tuple
+
+from app.engines import get_engine
+
+# Near-duplicate detection for re-scanned prescriptions. A difference hash
+# (dHash) of a tiny grayscale thumbnail survives re-compression, lighting
+# changes and small crops, which defeat byte-level hashing. Hashes live in one
+# uint64 array and are matched by Hamming distance in a single vectorized pass.
+
+HASH_SIZE = 16  # 16x16 gradient bits = 256-bit hash, stored as 4 uint64 words
+HASH_WORDS = HASH_SIZE * HASH_SIZE // 64
+
+
+def dhash(image_bytes: bytes) -> Optional[bytes]:
+    """256-bit difference hash of an image (32 bytes), or None if it cannot be decoded"""
+    ocr = get_engine("ocr")
+    np, Image = ocr.np, ocr.Image
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        image.draft("L", (HASH_SIZE * 4, HASH_SIZE * 4))  # JPEG: decode at reduced scale
+        thumb = np.asarray(image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR), dtype=np.int16)
+    except Exception:
+        return None
+    return np.packbits(thumb[:, 1:] > thumb[:, :-1]).tobytes()
+
+
+class PerceptualIndex:
+    """Fixed-capacity ring of (dHash, value) pairs with nearest-Hamming lookup
+
+    `lookup` returns the value of the closest hash added within the last
+    `ttl` seconds when it differs in at most `max_distance` bits; the oldest
+    entries are overwritten first.
+    """
+
+    def __init__(self, capacity: int = 1024, max_distance: int = 12, ttl: float = 900.0):
+        self.capacity = capacity
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self._hashes = None  # allocated on first add, so NumPy loads with the OCR engine
+        self._added = None
+        self._values = [None] * max(capacity, 1)
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, image_hash: bytes) -> Tuple[Optional[Any], Optional[int]]:
+        """Return (value, distance) of the nearest recent hash, or (None, None) if none is close enough"""
+        np = get_engine("ocr").np
+        with self._lock:
+            if self._size:
+                query = np.frombuffer(image_hash, dtype=np.uint64)
+                diff = np.bitwise_xor(self._hashes[:self._size], query)
+                distances = np.unpackbits(diff.view(np.uint8), axis=1).sum(axis=1)
+                distances[self._added[:self._size] < time.monotonic() - self.ttl] = HASH_SIZE * HASH_SIZE + 1
+                best = int(distances.argmin())
+                if distances[best] <= self.max_distance:
+                    self.hits += 1
+                    return self._values[best], int(distances[best])
+            self.misses += 1
+            return None, None
+
+    def add(self, image_hash: bytes, value: Any) -> None:
+        if self.capacity <= 0:
+            return
+        np = get_engine("ocr").np
+        with self._lock:
+            if self._hashes is None:
+                self._hashes = np.zeros((self.capacity, HASH_WORDS), dtype=np.uint64)
+                self._added = np.zeros(self.capacity, dtype=np.float64)
+            self._hashes[self._next] = np.frombuffer(image_hash, dtype=np.uint64)
+            self._added[self._next] = time.monotonic()
+            self._values[self._next] = value
+            self._next = (self._next + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": self._size, "capacity": self.capacity, "max_distance": self.max_distance,
+                    "ttl_seconds": self.ttl, "hits": self.hits, "misses": self.misses}
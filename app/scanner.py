@@ -0,0 +1,212 @@
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from app.schemas import dumps
+
+logger = logging.getLogger(__name__)
+
+# WebSocket protocol for scanner stations. A station keeps one connection open
+# and streams captures; every message is tagged with a station-chosen id.
+#
+# Station -> server (JSON text frames):
+#   {"type": "text", "id": "a1", "text": "...", "patient_age": 42}
+#   {"type": "image", "id": "a2", "content_type": "image/jpeg", "name": "scan.jpg", "patient_age": 42}
+#       followed by one binary frame with the image bytes
+#   {"type": "ping", "id": "p1"}
+# Server -> station:
+#   {"type": "ready", "max_in_flight": 4, "progress": true}
+#   {"type": "progress", "id": "a2", "stage": "ocr_done" | "analysis_done", "elapsed_ms": ...}
+#   {"type": "result", "id": "a2", "result": {...same body as /analyze-prescription...}}
+#   {"type": "error", "id": "a2", "status": 400, "detail": "...", "retry_after": 3}
+#   {"type": "pong", "id": "p1", "in_flight": 2}
+#
+# Flow control: at most max_in_flight captures per connection are processed at
+# once. While the window is full the server stops reading from the socket, so a
+# station that sends faster than it is served is held back by TCP instead of
+# queueing work on the OCR pool.
+
+
+class ScanError(Exception):
+    """A capture that cannot be processed; reported on the socket, the connection stays open"""
+
+    def __init__(self, status: int, detail: str, retry_after: Optional[int] = None, frame_id: Optional[str] = None):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+        self.retry_after = retry_after
+        self.frame_id = frame_id
+
+
+@dataclass
+class ScanFrame:
+    """One capture received from a station"""
+    id: str
+    content: bytes
+    content_type: str
+    name: str
+    patient_age: Optional[int]
+
+
+ProgressCallback = Callable[[str], Awaitable[None]]
+Processor = Callable[[ScanFrame, ProgressCallback], Awaitable[Any]]
+
+
+class ScannerSession:
+    """Serve one station connection: read frames, process them concurrently, reply by id"""
+
+    def __init__(self, websocket: WebSocket, process: Processor, max_in_flight: int = 4,
+                 progress: bool = False, max_frame_bytes: int = 10 * 1024 * 1024):
+        self.websocket = websocket
+        self.process = process
+        self.max_in_flight = max(1, max_in_flight)
+        self.progress = progress
+        self.max_frame_bytes = max_frame_bytes
+        self._window = asyncio.Semaphore(self.max_in_flight)
+        self._send_lock = asyncio.Lock()
+        self._active: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.received = 0
+        self.completed = 0
+        self.failed = 0
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        async with self._send_lock:
+            await self.websocket.send_text(dumps(message).decode("utf-8"))
+
+    async def run(self) -> None:
+        await self.websocket.accept()
+        await self.send({"type": "ready", "max_in_flight": self.max_in_flight, "progress": self.progress})
+        try:
+            while True:
+                # Wait for a free slot before reading: a full window pauses the socket
+                await self._window.acquire()
+                try:
+                    frame = await self._read_frame()
+                except ScanError as e:
+                    self._window.release()
+                    await self._send_error(e.frame_id, e.status, e.detail)
+                    continue
+                except BaseException:
+                    self._window.release()
+                    raise
+                if frame is None:
+                    self._window.release()
+                    continue
+                self.received += 1
+                self._active.add(frame.id)
+                task = asyncio.create_task(self._handle(frame))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            # The station is gone; captures still being processed have no one to answer
+            for task in list(self._tasks):
+                task.cancel()
+            logger.info(f"Scanner station disconnected after {self.received} captures "
+                        f"({self.completed} completed, {self.failed} failed)")
+
+    async def _read_frame(self) -> Optional[ScanFrame]:
+        """Read the next capture; control messages are answered here and return None"""
+        message = await self._receive()
+        if "bytes" in message and message["bytes"] is not None:
+            raise ScanError(400, "Binary frame without a preceding image header")
+        try:
+            header = json.loads(message.get("text") or "")
+        except ValueError:
+            raise ScanError(400, "Frames must be JSON text or image bytes after an image header")
+        if not isinstance(header, dict):
+            raise ScanError(400, "Frames must be JSON objects")
+
+        frame_id, kind = header.get("id"), header.get("type")
+        if kind == "ping":
+            await self.send({"type": "pong", "id": frame_id, "in_flight": len(self._active)})
+            return None
+        error = self._check_header(frame_id, kind, header)
+        if kind == "image":
+            # Always consume the payload so a rejected header does not desynchronize the stream
+            payload = await self._receive()
+            content = payload.get("bytes")
+            if error is None and content is None:
+                error = ScanError(400, "Expected a binary frame with the image after the image header")
+            elif error is None and len(content) > self.max_frame_bytes:
+                error = ScanError(413, f"Image exceeds {self.max_frame_bytes} bytes")
+        else:
+            text = header.get("text")
+            content = text.encode("utf-8") if isinstance(text, str) else None
+            if error is None and content is None:
+                error = ScanError(400, "Text frames need a \"text\" string")
+        if error is not None:
+            error.frame_id = frame_id
+            raise error
+
+        patient_age = header.get("patient_age")
+        return ScanFrame(
+            id=frame_id,
+            content=content,
+            content_type=header.get("content_type") or ("text/plain" if kind == "text" else "image/jpeg"),
+            name=header.get("name") or frame_id,
+            patient_age=patient_age if isinstance(patient_age, int) else None,
+        )
+
+    def _check_header(self, frame_id: Any, kind: Any, header: Dict[str, Any]) -> Optional[ScanError]:
+        if kind not in ("text", "image"):
+            return ScanError(400, f"Unknown frame type {kind!r} (expected text, image or ping)")
+        if not isinstance(frame_id, str) or not frame_id:
+            return ScanError(400, "Every frame needs a non-empty string \"id\"")
+        if frame_id in self._active:
+            return ScanError(409, f"Capture {frame_id} is already in progress")
+        if header.get("patient_age") is not None and not isinstance(header["patient_age"], int):
+            return ScanError(400, "patient_age must be an integer")
+        return None
+
+    async def _receive(self) -> Dict[str, Any]:
+        message = await self.websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        return message
+
+    async def _handle(self, frame: ScanFrame) -> None:
+        started = time.perf_counter()
+
+        async def report(stage: str) -> None:
+            # Runs inside analyses other connections may share, so it must never raise
+            if self.progress:
+                try:
+                    await self.send({"type": "progress", "id": frame.id, "stage": stage,
+                                     "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)})
+                except (WebSocketDisconnect, RuntimeError):
+                    pass
+
+        try:
+            result = await self.process(frame, report)
+            await report("analysis_done")
+            await self.send({"type": "result", "id": frame.id, "result": result})
+            self.completed += 1
+        except ScanError as e:
+            self.failed += 1
+            await self._send_error(frame.id, e.status, e.detail, e.retry_after)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Scanner capture {frame.id} failed: {e}")
+            await self._send_error(frame.id, 500, f"Analysis failed: {e}")
+        finally:
+            self._active.discard(frame.id)
+            self._window.release()
+
+    async def _send_error(self, frame_id: Optional[str], status: int, detail: str, retry_after: Optional[int] = None) -> None:
+        message = {"type": "error", "id": frame_id, "status": status, "detail": detail}
+        if retry_after is not None:
+            message["retry_after"] = retry_after
+        try:
+            await self.send(message)
+        except (WebSocketDisconnect, RuntimeError):
+            pass  # station disconnected meanwhile
@@ -0,0 +1,85 @@
+from dataclasses import dataclass, asdict, is_dataclass
+from typing import Optional, Dict, Any, List
+import json
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson is optional - fall back to the standard library encoder
+    orjson = None
+
+
+# Response schemas - plain dataclasses so orjson can serialize them natively
+# without going through FastAPI's jsonable_encoder.
+
+@dataclass
+class PrescriptionAnalysisResponse:
+    """Response body for /analyze-prescription"""
+    filename: str
+    content_type: Optional[str]
+    ibm_granite_analysis: Dict[str, Any]
+    medical_entities: Dict[str, Any]
+    verification_status: str
+    text_length: int
+    patient_age: Optional[int]
+    model_info: Dict[str, str]
+    timings: Dict[str, float]
+    cache: Dict[str, bool]
+
+
+@dataclass
+class TextAnalysisResponse:
+    """Response body for /analyze-text"""
+    text: str
+    ibm_granite_analysis: Dict[str, Any]
+    medical_entities: Dict[str, Any]
+    verification_status: str
+    patient_age: Optional[int]
+    models_used: Dict[str, str]
+    timings: Dict[str, float]
+    cache: Dict[str, bool]
+    analysis_id: str
+    incremental: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class EntitiesResponse:
+    """Response body for /extract-drug-info"""
+    text: str
+    drug_entities: List[Dict[str, Any]]
+    all_entities: List[Dict[str, Any]]
+    total_entities: int
+    model_used: str
+    groups: Optional[Dict[str, List[Dict[str, Any]]]] = None
+    group_totals: Optional[Dict[str, int]] = None
+
+
+@dataclass
+class ChatResponse:
+    """Response body for /granite-chat"""
+    user_message: str
+    granite_response: Dict[str, Any]
+    model_used: str
+    disclaimer: str
+
+
+def _default(obj: Any) -> Any:
+    """Fallback encoder hook for the standard library json module"""
+    if is_dataclass(obj):
+        return asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize a response body, preferring orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response that serializes dataclasses and dicts directly with orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
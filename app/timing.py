@@ -0,0 +1,30 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Awaitable, Any
+
+
+class StageTimer:
+    """Collects wall-clock durations (ms) for named pipeline stages of one request"""
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    async def timed(self, name: str, awaitable: Awaitable[Any]) -> Any:
+        """Await a coroutine and record its duration under the given stage name"""
+        with self.stage(name):
+            return await awaitable
+
+    def report(self) -> Dict[str, float]:
+        """Per-stage timings plus the total elapsed time, rounded to 0.01 ms"""
+        timings = {name: round(ms, 2) for name, ms in self.stages.items()}
+        timings["total"] = round((time.perf_counter() - self._start) * 1000, 2)
+        return timings
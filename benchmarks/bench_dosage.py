@@ -0,0 +1,72 @@
+"""Check the structured dosage grammar and time vectorized daily-dose computation.
+
+Usage: python benchmarks/bench_dosage.py [--doses 100000]
+
+Verifies every case in data/dosage_regression.jsonl (drug, amount, amount_max,
+unit, units per administration, frequency per day and duration per dose; exits non-zero on any mismatch),
+reports how many of those doses the previous mg-only pattern found, then times
+daily_doses_mg over a large synthetic list of dosages.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from app.extraction import extract_entities
+from app.dosing import daily_doses_mg
+
+CORPUS_PATH = os.path.join(HERE, "data", "dosage_regression.jsonl")
+
+# The pattern the extractor used before, kept for comparison
+LEGACY_PATTERN = re.compile(r'([A-Z][a-zA-Z\-]+)\s*(\d+)\s*mg', re.IGNORECASE)
+
+
+def structured_doses(text: str) -> list:
+    entities = extract_entities(text)
+    return [
+        [drug["word"], dose["amount"], dose["amount_max"], dose["unit"], dose["units_per_dose"], dose["frequency_per_day"],
+         dose["duration_days"]]
+        for drug, dose in zip(entities, entities[1:])
+        if drug["entity_group"] == "MEDICATION" and dose["entity_group"] == "DOSAGE"
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--doses", type=int, default=100000)
+    args = parser.parse_args()
+
+    with open(CORPUS_PATH) as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+
+    failures = 0
+    for case in cases:
+        got = structured_doses(case["text"])
+        if got != case["expected"]:
+            failures += 1
+            print(f"MISMATCH: {case['text']!r}\n  expected {case['expected']}\n  got      {got}")
+    print(f"dosage corpus: {len(cases) - failures}/{len(cases)} cases match")
+
+    expected = sum(len(case["expected"]) for case in cases)
+    legacy = sum(len(LEGACY_PATTERN.findall(case["text"])) for case in cases)
+    print(f"doses found: legacy mg-only pattern {legacy}/{expected}, structured grammar "
+          f"{sum(len(structured_doses(case['text'])) for case in cases)}/{expected}")
+
+    sample = [e for case in cases for e in extract_entities(case["text"]) if e["entity_group"] == "DOSAGE"]
+    dosages = (sample * (args.doses // len(sample) + 1))[:args.doses]
+    start = time.perf_counter()
+    doses = daily_doses_mg(dosages)
+    elapsed = time.perf_counter() - start
+    print(f"daily_doses_mg: {len(doses)} dosages in {elapsed * 1e3:.1f} ms "
+          f"({elapsed / len(doses) * 1e6:.3f} us/dose, including column build)")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Time the vectorized dose-limit check on single prescriptions and whole batches.
+
+Usage: python benchmarks/bench_dose_check.py [--prescriptions 2000]
+
+Builds synthetic prescriptions from the dosage regression corpus with random
+patient ages, then compares one check_prescriptions call over the batch with
+calling check_prescription once per prescription.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from app.extraction import extract_entities
+from app.dosing import check_prescription, check_prescriptions
+
+CORPUS_PATH = os.path.join(HERE, "data", "dosage_regression.jsonl")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prescriptions", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=4, help="dosage lines per prescription")
+    args = parser.parse_args()
+
+    with open(CORPUS_PATH) as f:
+        lines = [json.loads(line)["text"] for line in f if line.strip()]
+
+    rng = random.Random(0)
+    batch = [
+        (extract_entities("\n".join(rng.choice(lines) for _ in range(args.lines))), rng.choice([None, 6, 15, 40, 80]))
+        for _ in range(args.prescriptions)
+    ]
+    check_prescriptions(batch[:10])  # import NumPy and build the limit table
+
+    start = time.perf_counter()
+    per_prescription = [check_prescription(entities, age) for entities, age in batch]
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = check_prescriptions(batch)
+    whole = time.perf_counter() - start
+
+    assert batched == per_prescription, "batch and per-prescription checks disagree"
+    checks = sum(len(result) for result in batched)
+    flagged = sum(c["status"] == "exceeds" for result in batched for c in result)
+    print(f"{args.prescriptions} prescriptions, {checks} drug checks, {flagged} flagged")
+    print(f"check_prescription per item  {single / args.prescriptions * 1e6:8.1f} us/prescription")
+    print(f"check_prescriptions batched  {whole / args.prescriptions * 1e6:8.1f} us/prescription")
+
+
+if __name__ == "__main__":
+    main()
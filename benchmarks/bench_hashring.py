@@ -0,0 +1,67 @@
+"""Measure key movement and balance of the router's consistent-hash ring.
+
+Usage: python benchmarks/bench_hashring.py [--nodes 4] [--keys 100000] [--vnodes 160]
+
+Compares the ring with plain modulo hashing (hash(key) % n) when a node is
+added or removed. A ring should move about 1/n of the keys; modulo hashing
+moves most of them, which empties every node's cache at once.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.cache import content_hash
+from app.hashring import HashRing
+
+
+def moved(before: dict, after: dict) -> float:
+    return sum(before[k] != after[k] for k in before) / len(before)
+
+
+def imbalance(assignment: dict) -> str:
+    loads = list(Counter(assignment.values()).values())
+    mean = statistics.mean(loads)
+    return f"max/mean {max(loads) / mean:.3f}, stdev {statistics.pstdev(loads) / mean:.1%}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=4)
+    parser.add_argument("--keys", type=int, default=100_000)
+    parser.add_argument("--vnodes", type=int, default=160)
+    args = parser.parse_args()
+
+    keys = [content_hash(f"prescription-{i}") for i in range(args.keys)]
+    nodes = [f"http://10.0.0.{i + 1}:8000" for i in range(args.nodes)]
+    extra = f"http://10.0.0.{args.nodes + 1}:8000"
+
+    ring = HashRing(nodes, vnodes=args.vnodes)
+    start = time.perf_counter()
+    base = {k: ring.lookup(k) for k in keys}
+    lookup_us = (time.perf_counter() - start) / len(keys) * 1e6
+    ring.add(extra)
+    grown = {k: ring.lookup(k) for k in keys}
+    ring.remove(extra)
+    ring.remove(nodes[0])
+    shrunk = {k: ring.lookup(k) for k in keys}
+
+    def modulo(node_list):
+        return {k: node_list[int(k[:16], 16) % len(node_list)] for k in keys}
+
+    mod_base, mod_grown, mod_shrunk = modulo(nodes), modulo(nodes + [extra]), modulo(nodes[1:])
+
+    print(f"{args.keys} keys, {args.nodes} nodes, {args.vnodes} vnodes/node, lookup {lookup_us:.2f} us/key")
+    print(f"balance    ring: {imbalance(base)}   modulo: {imbalance(mod_base)}")
+    print(f"add node   ring moves {moved(base, grown):6.1%}  modulo moves {moved(mod_base, mod_grown):6.1%}"
+          f"  (ideal {1 / (args.nodes + 1):.1%})")
+    print(f"drop node  ring moves {moved(base, shrunk):6.1%}  modulo moves {moved(mod_base, mod_shrunk):6.1%}"
+          f"  (ideal {1 / args.nodes:.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Check and benchmark the word-boundary frequency/route matcher.
+
+Usage: python benchmarks/bench_matcher.py [--rounds 200]
+
+First verifies every case in data/entity_regression.jsonl (exact FREQUENCY and
+ROUTE entities with spans; exits non-zero on any mismatch), then compares
+entity counts and speed against the previous unanchored per-pattern scans
+(the current timing covers the whole line grammar, dosages included).
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from app.extraction import extract_line_entities
+
+CORPUS_PATH = os.path.join(HERE, "data", "entity_regression.jsonl")
+MATCHED_GROUPS = ("FREQUENCY", "ROUTE")
+
+# The unanchored patterns the extractor used before, kept for comparison
+LEGACY_PATTERNS = [
+    (r'tid|three times daily|3 times daily', 'FREQUENCY', 'TID'),
+    (r'bid|twice daily|2 times daily', 'FREQUENCY', 'BID'),
+    (r'od|once daily|daily', 'FREQUENCY', 'OD'),
+    (r'qid|four times daily|4 times daily', 'FREQUENCY', 'QID'),
+    (r'as needed|prn', 'FREQUENCY', 'PRN'),
+    (r'oral|by mouth|po', 'ROUTE', 'Oral'),
+    (r'topical|apply', 'ROUTE', 'Topical'),
+    (r'injection|inject|iv', 'ROUTE', 'Injection'),
+]
+
+
+def legacy_entities(text: str) -> list:
+    lowered = text.lower()
+    return [
+        [group, label, m.start(), m.end()]
+        for pattern, group, label in LEGACY_PATTERNS
+        for m in re.finditer(pattern, lowered)
+    ]
+
+
+def current_entities(text: str) -> list:
+    return [
+        [e["entity_group"], e["word"], e["start"], e["end"]]
+        for e in extract_line_entities(text) if e["entity_group"] in MATCHED_GROUPS
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    with open(CORPUS_PATH) as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+
+    failures = 0
+    for case in cases:
+        got = current_entities(case["text"])
+        if got != case["expected"]:
+            failures += 1
+            print(f"MISMATCH: {case['text']!r}\n  expected {case['expected']}\n  got      {got}")
+    print(f"regression corpus: {len(cases) - failures}/{len(cases)} cases match")
+
+    texts = [case["text"] for case in cases]
+    legacy_count = sum(len(legacy_entities(t)) for t in texts)
+    current_count = sum(len(current_entities(t)) for t in texts)
+    print(f"FREQUENCY/ROUTE entities: legacy {legacy_count}, word-boundary {current_count}")
+
+    for name, fn in (("legacy unanchored scans", legacy_entities), ("single-pass line grammar", current_entities)):
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            for text in texts:
+                fn(text)
+        per_doc = (time.perf_counter() - start) / (args.rounds * len(texts)) * 1e6
+        print(f"{name:<24} {per_doc:8.2f} us/line")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Benchmark the remote-model path offline against the bundled mock inference server.
+
+Usage: python benchmarks/bench_model_path.py [--calls 400] [--concurrency 32]
+           [--latency lognormal:80,0.5] [--error-rate 0.02] [--loading-rate 0.02] [--retries 2]
+
+Starts mock_hf_server.py on a free local port, points the API's HF_INFERENCE_URL
+at it, and drives call_hugging_face_model with concurrent calls. It compares a
+new connection per call (pool size 0) with the keep-alive pool, each with and
+without retries, and reports throughput, latency percentiles and outcomes.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_mock(port: int, args: argparse.Namespace) -> subprocess.Popen:
+    command = [
+        sys.executable, os.path.join(ROOT, "mock_hf_server.py"), "--port", str(port),
+        "--latency", args.latency, "--error-rate", str(args.error_rate),
+        "--loading-rate", str(args.loading_rate), "--seed", "0",
+    ]
+    process = subprocess.Popen(command, cwd=ROOT)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/stats", timeout=1)
+            return process
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.2)
+    process.kill()
+    sys.exit("mock_hf_server.py did not start")
+
+
+async def drive(main, model: str, task: str, calls: int, concurrency: int) -> tuple:
+    """Run `calls` model calls with at most `concurrency` in flight; returns (seconds, latencies, outcomes)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, outcomes = [], Counter()
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            result = await main.call_hugging_face_model(model, f"Amoxicillin 500mg TID #{i}", task)
+            latencies.append(time.perf_counter() - start)
+            outcomes["ok" if result["success"] else result["error"][:40]] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    return time.perf_counter() - start, sorted(latencies), outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", default="lognormal:80,0.5", help="mock server latency distribution (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--loading-rate", type=float, default=0.02)
+    parser.add_argument("--retries", type=int, default=2, help="retries for the retrying configurations")
+    parser.add_argument("--task", default="token-classification", choices=["token-classification", "text-generation"])
+    args = parser.parse_args()
+
+    port = free_port()
+    mock = start_mock(port, args)
+    os.environ["HF_INFERENCE_URL"] = f"http://127.0.0.1:{port}"
+    os.environ.setdefault("AUDIT_LOG_ENABLED", "false")
+    from app import main as api
+    from app.hf_client import InferenceClient
+
+    model = api.IBM_MODELS["biobert_ner" if args.task == "token-classification" else "granite_instruct"]
+    loop = asyncio.new_event_loop()
+    # call_hugging_face_model runs blocking HTTP in worker threads; size the pool to the concurrency
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=args.concurrency))
+    print(f"{args.calls} calls, concurrency {args.concurrency}, latency {args.latency}, "
+          f"errors {args.error_rate:.0%}, loading {args.loading_rate:.0%}")
+    print(f"{'configuration':<24}{'calls/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'ok':>7}  requests/retries")
+    try:
+        for pool_size, retries in ((0, 0), (args.concurrency, 0), (args.concurrency, args.retries)):
+            api.HF_CLIENT = InferenceClient(os.environ["HF_INFERENCE_URL"], pool_size=pool_size,
+                                            retries=retries, max_loading_wait=0.05, backoff=0.02)
+            seconds, latencies, outcomes = loop.run_until_complete(
+                drive(api, model, args.task, args.calls, args.concurrency))
+            counts = api.HF_CLIENT.stats()["counts"]
+
+            def pct(q: float) -> float:
+                return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+
+            name = f"{'pooled' if pool_size else 'no pool'}, {retries} retries"
+            print(f"{name:<24}{args.calls / seconds:9.1f}{pct(0.5):9.1f}{pct(0.95):9.1f}{pct(0.99):9.1f}"
+                  f"{outcomes['ok'] / args.calls:7.1%}  {counts.get('requests', 0)} requests, "
+                  f"{counts.get('retries', 0)} retries")
+            failures = {k: v for k, v in outcomes.items() if k != "ok"}
+            if failures:
+                print(f"{'':<24}failures: {failures}")
+    finally:
+        loop.close()
+        mock.terminate()
+        mock.wait()
+
+
+if __name__ == "__main__":
+    main()
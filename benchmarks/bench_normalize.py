@@ -0,0 +1,97 @@
+"""Benchmark the OCR text normalization stage: throughput and dosage recall.
+
+Usage: python benchmarks/bench_normalize.py [--documents 2000] [--noise 0.5] [--seed 7]
+
+Builds a noisy corpus by injecting typical OCR confusions (O/0, l/1, rng/mg,
+stray whitespace) into clean prescription lines, then measures how many of the
+true drug + dose pairs the extractor recovers with and without normalization.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.extraction import extract_entities, summarize_entities
+from app.normalize import normalize_text
+
+DRUGS = ["Amoxicillin", "Ibuprofen", "Paracetamol", "Metformin", "Lisinopril", "Atorvastatin",
+         "Azithromycin", "Omeprazole", "Ciprofloxacin", "Prednisolone", "Amlodipine", "Cetirizine"]
+DOSES = [5, 10, 20, 40, 50, 100, 200, 250, 400, 500, 850, 1000]
+FREQUENCIES = ["tid", "bid", "od", "qid", "prn", "once daily", "twice daily"]
+UNIT_NOISE = ["rng", "mq", "m9", "rnq", " mg", "  mg"]
+
+
+def corrupt(text: str, rng: random.Random, noise: float) -> str:
+    """Inject OCR-style confusions with probability `noise` per opportunity"""
+    out = []
+    for ch in text:
+        if ch == "0" and rng.random() < noise:
+            out.append(rng.choice("Oo"))
+        elif ch == "1" and rng.random() < noise:
+            out.append(rng.choice("lI"))
+        elif ch == "l" and rng.random() < noise / 3:
+            out.append("1")
+        elif ch == " " and rng.random() < noise / 4:
+            out.append("  \t")
+        else:
+            out.append(ch)
+    noisy = "".join(out)
+    if "mg" in noisy and rng.random() < noise:
+        noisy = noisy.replace("mg", rng.choice(UNIT_NOISE), 1)
+    return noisy
+
+
+def build_corpus(documents: int, noise: float, seed: int):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(documents):
+        lines, truth = [], []
+        for _ in range(rng.randint(1, 4)):
+            drug, dose = rng.choice(DRUGS), rng.choice(DOSES)
+            lines.append(f"{drug} {dose}mg {rng.choice(FREQUENCIES)} after food")
+            truth.append(f"{drug} {dose}mg")
+        corpus.append((corrupt("\n".join(lines), rng, noise), truth))
+    return corpus
+
+
+def recall(corpus, transform) -> float:
+    found = total = 0
+    for text, truth in corpus:
+        drugs, _ = summarize_entities(extract_entities(transform(text)))
+        remaining = list(drugs)
+        for expected in truth:
+            total += 1
+            if expected in remaining:
+                remaining.remove(expected)
+                found += 1
+    return found / total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--noise", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.documents, args.noise, args.seed)
+    texts = [text for text, _ in corpus]
+    total_bytes = sum(len(t) for t in texts)
+
+    start = time.perf_counter()
+    for _ in range(5):
+        for text in texts:
+            normalize_text(text)
+    elapsed = (time.perf_counter() - start) / 5
+
+    print(f"{args.documents} noisy documents, {total_bytes / 1024:.0f} KiB, noise={args.noise}")
+    print(f"normalization throughput: {total_bytes / elapsed / 1e6:8.1f} MB/s ({args.documents / elapsed:,.0f} docs/s)")
+    print(f"dosage recall raw OCR:    {recall(corpus, lambda t: t):8.1%}")
+    print(f"dosage recall normalized: {recall(corpus, normalize_text):8.1%}")
+
+
+if __name__ == "__main__":
+    main()
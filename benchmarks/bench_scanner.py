@@ -0,0 +1,106 @@
+"""Benchmark scanner-station traffic: one multipart POST per capture vs the /ws/scanner socket.
+
+Usage: python benchmarks/bench_scanner.py [--captures 200] [--in-flight 4]
+
+Starts the API with uvicorn on a free local port and sends the same text
+captures both ways. HTTP opens a new connection per capture, the way the
+stations do today. The socket path keeps one connection and up to
+--in-flight captures outstanding. Requires the `websockets` package
+(installed with uvicorn[standard]).
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_api(port: int) -> subprocess.Popen:
+    env = {**os.environ, "AUDIT_LOG_ENABLED": "false", "ADMISSION_ENABLED": "false", "LOOP_MONITOR_ENABLED": "false"}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/health", timeout=1)
+            return process
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.2)
+    process.kill()
+    sys.exit("API did not start")
+
+
+def captures(count: int) -> list:
+    # Distinct texts so request coalescing never applies
+    return [f"Rx #{i}\nAmoxicillin {250 + i % 4 * 250}mg TID for 7 days\nParacetamol 500mg QID PRN" for i in range(count)]
+
+
+def run_http(port: int, texts: list) -> float:
+    start = time.perf_counter()
+    for i, text in enumerate(texts):
+        files = {"file": (f"capture-{i}.txt", text.encode(), "text/plain")}
+        response = requests.post(f"http://127.0.0.1:{port}/analyze-prescription", files=files, timeout=30)
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def run_socket(port: int, texts: list, in_flight: int) -> float:
+    import websockets
+
+    start = time.perf_counter()
+    async with websockets.connect(f"ws://127.0.0.1:{port}/ws/scanner?max_in_flight={in_flight}") as ws:
+        window = json.loads(await ws.recv())["max_in_flight"]
+        sent = done = 0
+        while done < len(texts):
+            while sent < len(texts) and sent - done < window:
+                await ws.send(json.dumps({"type": "text", "id": str(sent), "text": texts[sent]}))
+                sent += 1
+            message = json.loads(await ws.recv())
+            if message["type"] == "error":
+                raise RuntimeError(message)
+            done += message["type"] == "result"
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--captures", type=int, default=200)
+    parser.add_argument("--in-flight", type=int, default=4)
+    args = parser.parse_args()
+    try:
+        import websockets  # noqa: F401
+    except ImportError:
+        sys.exit("This benchmark needs the websockets package (pip install websockets)")
+
+    port = free_port()
+    api = start_api(port)
+    try:
+        run_http(port, captures(5))  # warm up
+        http_s = run_http(port, captures(args.captures))
+        socket_s = asyncio.run(run_socket(port, captures(args.captures), args.in_flight))
+    finally:
+        api.terminate()
+        api.wait()
+    print(f"{args.captures} captures")
+    print(f"HTTP multipart POST per capture: {http_s / args.captures * 1000:7.2f} ms/capture")
+    print(f"/ws/scanner ({args.in_flight} in flight):      {socket_s / args.captures * 1000:7.2f} ms/capture "
+          f"({http_s / socket_s:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark response serialization: jsonable_encoder + json vs FastJSONResponse.
+
+Usage: python benchmarks/bench_serialization.py [--entities 500] [--rounds 200]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.schemas import TextAnalysisResponse, FastJSONResponse, orjson
+
+
+def build_payload(num_entities: int) -> TextAnalysisResponse:
+    """Build an analysis response with a long report and many entities"""
+    entities = []
+    for i in range(num_entities):
+        entities.append({
+            "word": f"Drug{i}",
+            "entity_group": ["MEDICATION", "DOSAGE", "FREQUENCY", "ROUTE"][i % 4],
+            "score": 0.85,
+            "start": i * 10,
+            "end": i * 10 + 7
+        })
+    report = "*Medical Prescription Analysis*\n" + "\n".join(f"• Drug{i} 500mg" for i in range(num_entities))
+    return TextAnalysisResponse(
+        text="Amoxicillin 500mg TID...",
+        ibm_granite_analysis={"success": True, "data": [{"generated_text": report}]},
+        medical_entities={"success": True, "data": entities},
+        verification_status="processed",
+        patient_age=42,
+        models_used={"granite": "microsoft/BioGPT-Large", "ner": "d4data/biomedical-ner-all"},
+        timings={"rendering": 0.42, "extraction": 0.31, "total": 0.9},
+        cache={"ocr": False},
+        analysis_id="0123456789abcdef0123456789abcdef"
+    )
+
+
+def time_it(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entities", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    payload = build_payload(args.entities)
+
+    def before():
+        # What FastAPI does for a plain dict return value
+        return JSONResponse(jsonable_encoder(payload)).body
+
+    def after():
+        return FastJSONResponse(payload).body
+
+    assert json.loads(before()) == json.loads(after())
+
+    before_ms = time_it(before, args.rounds)
+    after_ms = time_it(after, args.rounds)
+    print(f"encoder: {'orjson' if orjson is not None else 'json (orjson not installed)'}")
+    print(f"entities: {args.entities}, body size: {len(after()) / 1024:.1f} KiB")
+    print(f"jsonable_encoder + json: {before_ms:8.3f} ms/response")
+    print(f"FastJSONResponse:        {after_ms:8.3f} ms/response")
+    print(f"speedup:                 {before_ms / after_ms:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
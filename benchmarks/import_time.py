@@ -0,0 +1,60 @@
+"""Report module import cost of the API (python -X importtime style).
+
+Usage: python benchmarks/import_time.py [--module app.main] [--top 20] [--preload ocr]
+
+Runs the import in a fresh interpreter with -X importtime and prints the total
+time-to-import plus the packages that contribute the most import time.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(module: str, preload: str = "") -> list:
+    """Import module in a clean interpreter and parse the -X importtime output"""
+    code = f"import {module}"
+    if preload:
+        code += f"; from app.engines import warm_up; warm_up({preload.split(',')!r})"
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        sys.exit(proc.stderr)
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--preload", default="", help="Comma-separated engines to load after import, e.g. ocr")
+    args = parser.parse_args()
+
+    rows = measure(args.module, args.preload)
+    # Attribute each module's self time to its root package
+    by_package = defaultdict(int)
+    for name, self_us, _ in rows:
+        by_package[name.strip().split(".")[0]] += self_us
+
+    total_ms = sum(by_package.values()) / 1000
+    print(f"Total import time for {args.module}{' + ' + args.preload if args.preload else ''}: {total_ms:.1f} ms")
+    print(f"{'package':<30} {'self ms':>10}")
+    for name, self_us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{name:<30} {self_us / 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
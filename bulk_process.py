@@ -0,0 +1,205 @@
+"""Analyze many prescriptions locally, without going through the HTTP API.
+
+Usage:
+    python bulk_process.py INPUT --output results.ndjson [--workers 4] [--parquet results.parquet]
+
+INPUT is a directory (searched recursively) or a manifest file listing one
+path per line, optionally followed by ",<patient_age>". Images are OCR'd and
+normalized and text files are decoded the same way /analyze-prescription
+handles them. Each file is then analyzed in a process pool and written as
+one NDJSON record.
+
+The NDJSON output doubles as the checkpoint. Re-running with the same
+--output skips files already recorded, so an interrupted backfill resumes
+where it stopped. Use --retry-errors to re-run files that previously failed.
+"""
+import argparse
+import asyncio
+import json
+import mimetypes
+import multiprocessing
+import os
+import sys
+import time
+from typing import Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SUPPORTED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".gif", ".webp", ".txt", ".pdf"}
+
+_main = None
+_loop = None
+
+
+def _init_worker():
+    """Load the analysis pipeline once per worker process"""
+    global _main, _loop
+    # One OCR thread per process (the pool provides the parallelism). Offline
+    # backfills never write to the API's audit log, whatever .env says
+    os.environ.setdefault("OCR_WORKERS", "1")
+    os.environ["AUDIT_LOG_ENABLED"] = "false"
+    import app.main
+    _main = app.main
+    _loop = asyncio.new_event_loop()
+
+
+def document_text(path: str, content: bytes) -> Tuple[str, dict]:
+    """Extract text from a file the way analyze_document does; returns (text, stage timings)"""
+    from app.timing import StageTimer
+    content_type, _ = mimetypes.guess_type(path)
+    timer = StageTimer()
+    if content_type and content_type.startswith("text"):
+        text = content.decode("utf-8")
+    elif content_type and content_type.startswith("image"):
+        with timer.stage("ocr"):
+            text = _main.extract_text_from_image(content)
+        if _main.NORMALIZE_OCR_TEXT:
+            with timer.stage("normalization"):
+                text = _main.normalize_text(text)
+        if text.startswith("Error:"):
+            raise ValueError(text)
+    else:
+        text = content.decode("utf-8", errors="ignore")
+    return text, timer.stages
+
+
+def process_file(task: Tuple[str, Optional[int]]) -> dict:
+    """Analyze one file; never raises, errors are returned in the record"""
+    from app.timing import StageTimer
+    path, patient_age = task
+    started = time.perf_counter()
+    record = {"path": path, "patient_age": patient_age, "status": "ok"}
+    try:
+        with open(path, "rb") as f:
+            content = f.read()
+        record["content_hash"] = _main.content_hash(content)
+        text, stages = document_text(path, content)
+        if len(text.strip()) < 10:
+            raise ValueError("Text content too short for analysis")
+
+        timer = StageTimer()
+        timer.stages.update(stages)
+        result = _loop.run_until_complete(_main.run_analysis(text, patient_age, timer))
+        granite = result["granite"]
+        report = granite["data"][0] if granite.get("success") else {}
+        record.update(
+            text=text,
+            entities=result["entities"].get("data", []),
+            dose_checks=report.get("dose_checks", []),
+            report=report.get("generated_text"),
+            timings=timer.report(),
+        )
+    except Exception as e:
+        record.update(status="error", error=str(e))
+    record["seconds"] = round(time.perf_counter() - started, 4)
+    return record
+
+
+def discover(source: str) -> Iterator[Tuple[str, Optional[int]]]:
+    """Yield (path, patient_age) from a directory or a manifest file"""
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                    yield os.path.join(root, name), None
+        return
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            path, _, age = line.partition(",")
+            path = path.strip()
+            yield (path if os.path.isabs(path) else os.path.join(base, path)), (int(age) if age.strip() else None)
+
+
+def completed_paths(output: str, retry_errors: bool) -> set:
+    """Paths already recorded in an existing NDJSON output (the checkpoint)"""
+    done = set()
+    if os.path.exists(output):
+        with open(output) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # partially written last line of an interrupted run
+                if not (retry_errors and record.get("status") == "error"):
+                    done.add(record["path"])
+    return done
+
+
+def write_parquet(ndjson_path: str, parquet_path: str) -> None:
+    """Convert the NDJSON results to Parquet; nested fields are stored as JSON strings"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    nested = ("entities", "dose_checks", "timings")
+    latest = {}
+    with open(ndjson_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            latest[record["path"]] = record  # a retried file keeps its last result
+    rows = [
+        {key: json.dumps(value) if key in nested else value for key, value in record.items()}
+        for record in latest.values()
+    ]
+    pq.write_table(pa.Table.from_pylist(rows), parquet_path)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="directory of documents or manifest file")
+    parser.add_argument("--output", "-o", required=True, help="NDJSON results file (also the resume checkpoint)")
+    parser.add_argument("--parquet", help="also write the results to this Parquet file when done")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--patient-age", type=int, help="default patient age for files without one in the manifest")
+    parser.add_argument("--retry-errors", action="store_true", help="re-process files recorded with an error")
+    parser.add_argument("--progress-every", type=float, default=2.0, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+    if args.parquet:
+        try:
+            import pyarrow.parquet  # noqa: F401 - fail before hours of processing, not after
+        except ImportError:
+            sys.exit("Parquet output requires pyarrow (pip install pyarrow)")
+
+    done = completed_paths(args.output, args.retry_errors)
+    tasks = [
+        (path, age if age is not None else args.patient_age)
+        for path, age in discover(args.input) if path not in done
+    ]
+    print(f"{len(tasks)} files to process ({len(done)} already in {args.output})", file=sys.stderr)
+
+    processed = errors = 0
+    started = last_report = time.monotonic()
+    if tasks:
+        with open(args.output, "a+") as out, \
+                multiprocessing.Pool(args.workers, initializer=_init_worker) as pool:
+            if out.tell() > 0:
+                out.seek(out.tell() - 1)
+                if out.read(1) != "\n":
+                    out.write("\n")  # terminate a line cut off by an interrupted run
+            for record in pool.imap_unordered(process_file, tasks, chunksize=4):
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                processed += 1
+                errors += record["status"] == "error"
+                now = time.monotonic()
+                if now - last_report >= args.progress_every or processed == len(tasks):
+                    rate = processed / max(now - started, 1e-9)
+                    eta = (len(tasks) - processed) / rate if rate else 0
+                    print(f"[{processed}/{len(tasks)}] {rate:.1f} files/s, {errors} errors, ETA {eta:.0f}s",
+                          file=sys.stderr)
+                    last_report = now
+
+    if args.parquet:
+        write_parquet(args.output, args.parquet)
+        print(f"Wrote {args.parquet}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
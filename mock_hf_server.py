@@ -0,0 +1,146 @@
+"""Local stand-in for the Hugging Face inference API, with latency and failure injection.
+
+Usage:
+    python mock_hf_server.py [--port 8100] [--latency lognormal:150,0.6] [--error-rate 0.02]
+        [--loading-rate 0.05] [--cold-start 5] [--gated MODEL ...] [--token hf_test]
+
+Then start the API with HF_INFERENCE_URL=http://127.0.0.1:8100.
+
+POST /models/<model_id> answers like the hosted API:
+  * token-classification models (ids containing "ner", or --task MODEL=token-classification)
+    return aggregated entities from the rule-based extractor in app/extraction.py;
+  * other models return [{"generated_text": ...}], honouring max_new_tokens and
+    return_full_text.
+
+Failure modes:
+  * --cold-start S: each model answers 503 {"error": "... is currently loading",
+    "estimated_time": ...} for its first S seconds after the first request;
+  * --loading-rate / --error-rate: random 503 loading and 500 responses;
+  * --gated MODEL: 401 unless the request carries "Authorization: Bearer <--token>".
+
+Latency distributions (milliseconds): fixed:MS, uniform:LO,HI, normal:MEAN,SD,
+lognormal:MEDIAN,SIGMA, exp:MEAN. GET /stats returns per-model response counts,
+and POST /reset clears counters and cold-start state.
+"""
+import argparse
+import asyncio
+import math
+import random
+import time
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from app.extraction import extract_entities
+
+FILLER = ("Take as directed and review the prescription with a pharmacist before dispensing. "
+          "Monitor for adverse effects and confirm the dosage against the patient's age.").split()
+
+
+def latency_sampler(spec: str, rng: random.Random) -> Callable[[], float]:
+    """Parse a latency spec into a function returning seconds"""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    samplers = {
+        "fixed": lambda: values[0],
+        "uniform": lambda: rng.uniform(values[0], values[1]),
+        "normal": lambda: max(0.0, rng.gauss(values[0], values[1])),
+        "lognormal": lambda: rng.lognormvariate(math.log(values[0]), values[1]),
+        "exp": lambda: rng.expovariate(1 / values[0]),
+    }
+    if kind not in samplers:
+        raise argparse.ArgumentTypeError(f"unknown latency distribution {kind!r} (use {', '.join(samplers)})")
+    arity = {"fixed": 1, "exp": 1}.get(kind, 2)
+    if len(values) != arity:
+        raise argparse.ArgumentTypeError(f"{kind} latency takes {arity} value(s), got {spec!r}")
+    return lambda: samplers[kind]() / 1000
+
+
+def generate_text(prompt: str, parameters: Dict) -> str:
+    """Deterministic filler continuation of roughly max_new_tokens words"""
+    words = int(parameters.get("max_new_tokens", 50))
+    seed = sum(map(ord, prompt)) % len(FILLER)
+    continuation = " ".join(FILLER[(seed + i) % len(FILLER)] for i in range(words))
+    return prompt + " " + continuation if parameters.get("return_full_text", True) else continuation
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    rng = random.Random(args.seed)
+    sample_latency = latency_sampler(args.latency, rng)
+    tasks = dict(t.split("=", 1) for t in args.task)
+    first_seen: Dict[str, float] = {}
+    counts: Dict[str, Counter] = defaultdict(Counter)
+    app = FastAPI(title="Mock Hugging Face Inference API")
+
+    def task_for(model_id: str) -> str:
+        return tasks.get(model_id) or ("token-classification" if "ner" in model_id.lower() else "text-generation")
+
+    def respond(model_id: str, status: int, body) -> JSONResponse:
+        counts[model_id][str(status)] += 1
+        return JSONResponse(body, status_code=status)
+
+    @app.post("/models/{model_id:path}")
+    async def infer(model_id: str, request: Request):
+        await asyncio.sleep(sample_latency())
+        if model_id in args.gated and request.headers.get("authorization") != f"Bearer {args.token}":
+            return respond(model_id, 401, {"error": "Authorization header is correct, but the token seems invalid"})
+        now = time.monotonic()
+        loading_left = args.cold_start - (now - first_seen.setdefault(model_id, now))
+        if loading_left > 0 or rng.random() < args.loading_rate:
+            estimated = loading_left if loading_left > 0 else rng.uniform(1, 20)
+            return respond(model_id, 503, {"error": f"Model {model_id} is currently loading",
+                                           "estimated_time": round(estimated, 2)})
+        if rng.random() < args.error_rate:
+            return respond(model_id, 500, {"error": "Internal server error"})
+        try:
+            payload = await request.json()
+            inputs = payload["inputs"]
+        except (ValueError, KeyError, TypeError):
+            return respond(model_id, 400, {"error": "Invalid payload: expected {\"inputs\": ...}"})
+        if task_for(model_id) == "token-classification":
+            return respond(model_id, 200, [
+                {key: e[key] for key in ("entity_group", "score", "word", "start", "end")}
+                for e in extract_entities(inputs)
+            ])
+        return respond(model_id, 200, [{"generated_text": generate_text(inputs, payload.get("parameters") or {})}])
+
+    @app.get("/stats")
+    async def stats():
+        return {"config": vars(args), "models": {model: dict(c) for model, c in counts.items()}}
+
+    @app.post("/reset")
+    async def reset():
+        first_seen.clear()
+        counts.clear()
+        return {"reset": True}
+
+    return app
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", default="lognormal:150,0.5", help="latency distribution in ms (see above)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--loading-rate", type=float, default=0.0, help="fraction of requests answered with 503 loading")
+    parser.add_argument("--cold-start", type=float, default=0.0, help="seconds each model reports loading after first use")
+    parser.add_argument("--gated", nargs="*", default=[], help="model ids that answer 401 without a valid token")
+    parser.add_argument("--token", default="hf_test", help="token accepted for gated models")
+    parser.add_argument("--task", action="append", default=[], metavar="MODEL=TASK", help="override a model's task")
+    parser.add_argument("--seed", type=int, help="random seed for reproducible runs")
+    args = parser.parse_args(argv)
+    try:
+        latency_sampler(args.latency, random.Random())  # validate before starting
+    except (argparse.ArgumentTypeError, ValueError) as e:
+        parser.error(f"--latency: {e}")
+    return args
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    args = parse_args()
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,306 @@
+"""Cache-affine routing front for several API backend nodes.
+
+Usage:
+    python router.py --backend http://10.0.0.1:8000 --backend http://10.0.0.2:8000 [--port 8080]
+    python router.py --spawn 3 [--base-port 8001]     # local test: start 3 uvicorn backends
+
+POST /analyze-prescription and /analyze-text are routed by consistent hashing
+on the uploaded file's or text's content hash. Repeats of the same image or
+text land on the node whose OCR cache and models are already warm. Adding or
+removing a node only moves about 1/n of the keys. /analyze-text/incremental
+goes to the node that issued the analysis_id. Other requests are spread
+round-robin.
+
+Nodes are health-checked on GET /health: a node leaves the ring after
+--fall consecutive failures and rejoins after --rise successes. A node that
+refuses a connection is taken out immediately and the request is retried on
+the next node in ring order. GET /router/status shows membership, hash-space
+shares and per-node counters. WebSocket routes (/ws/scanner) are not proxied;
+stations connect to a node directly.
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from dotenv import load_dotenv
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from requests.adapters import HTTPAdapter
+
+from app.admission import AdmissionController, client_identity, route_cost
+from app.cache import LRUCache, content_hash
+from app.hashring import HashRing
+
+load_dotenv()
+
+logger = logging.getLogger("router")
+
+AFFINE_ROUTES = {"/analyze-prescription", "/analyze-text", "/analyze-text/incremental"}
+# Hop-by-hop and length/encoding headers are recomputed on each side of the proxy
+SKIP_REQUEST_HEADERS = {"host", "content-length", "connection", "keep-alive", "transfer-encoding", "upgrade"}
+SKIP_RESPONSE_HEADERS = {"content-length", "content-encoding", "connection", "keep-alive", "transfer-encoding"}
+
+
+class NodePool:
+    """Backend membership: health state per node, with the ring holding only healthy nodes"""
+
+    def __init__(self, nodes: List[str], vnodes: int, fall: int, rise: int, pool_size: int):
+        self.nodes = [node.rstrip("/") for node in nodes]
+        self.ring = HashRing(vnodes=vnodes)
+        self.fall = fall
+        self.rise = rise
+        self.state = {node: {"healthy": False, "failures": 0, "successes": 0, "requests": 0,
+                             "errors": 0, "last_error": None, "changed": None} for node in self.nodes}
+        self._lock = threading.Lock()
+        self._round_robin = itertools.cycle(self.nodes)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.nodes), pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def mark(self, node: str, ok: bool, error: Optional[str] = None, immediate: bool = False) -> None:
+        """Record a health result; move the node in or out of the ring on a state change"""
+        with self._lock:
+            state = self.state[node]
+            if ok:
+                state["failures"], state["successes"] = 0, state["successes"] + 1
+                if not state["healthy"] and state["successes"] >= self.rise:
+                    state.update(healthy=True, changed=time.time())
+                    self.ring.add(node)
+                    logger.warning(f"Node {node} is healthy, added to the ring")
+            else:
+                state["successes"], state["failures"] = 0, state["failures"] + 1
+                state["last_error"] = error
+                if state["healthy"] and (immediate or state["failures"] >= self.fall):
+                    state.update(healthy=False, changed=time.time())
+                    self.ring.remove(node)
+                    logger.warning(f"Node {node} is down ({error}), removed from the ring")
+
+    def count(self, node: str, field: str) -> None:
+        with self._lock:
+            self.state[node][field] += 1
+
+    def check(self, node: str) -> None:
+        try:
+            response = self.session.get(f"{node}/health", timeout=2)
+            self.mark(node, response.status_code == 200, f"health check returned {response.status_code}")
+        except requests.exceptions.RequestException as e:
+            self.mark(node, False, type(e).__name__)
+
+    def candidates(self, key: Optional[str], pinned: Optional[str] = None) -> List[str]:
+        """Nodes to try in order: the pinned or owning node first, then ring successors"""
+        healthy = self.ring.nodes
+        if not healthy:
+            return []
+        if key is not None:
+            order = self.ring.preference(key, 2)
+        else:
+            with self._lock:
+                node = next(node for node in self._round_robin if node in healthy)
+            order = [node] + [n for n in healthy if n != node][:1]
+        if pinned in healthy:
+            order = [pinned] + [n for n in order if n != pinned]
+        return order
+
+    def status(self) -> Dict[str, Any]:
+        shares = self.ring.shares()
+        with self._lock:
+            return {
+                "vnodes": self.ring.vnodes,
+                "healthy": len(shares),
+                "nodes": {node: {**state, "share": shares.get(node, 0.0)} for node, state in self.state.items()},
+            }
+
+
+async def read_form(request: Request, body: bytes):
+    """Parse a form from an already-read body (the body itself is forwarded unchanged)"""
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+    return await Request(request.scope, receive).form()
+
+
+async def routing_key(request: Request, body: bytes, issued: LRUCache) -> Tuple[Optional[str], Optional[str]]:
+    """(content hash to route on, node that must serve it) for affine routes"""
+    path = request.url.path
+    if request.method != "POST" or path not in AFFINE_ROUTES:
+        return None, None
+    form = await read_form(request, body)
+    try:
+        if path == "/analyze-prescription":
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                return None, None
+            return content_hash(await upload.read()), None
+        if path == "/analyze-text/incremental":
+            analysis_id = form.get("analysis_id")
+            return (content_hash(analysis_id), issued.get(analysis_id)) if isinstance(analysis_id, str) else (None, None)
+        text = form.get("text")
+        return (content_hash(text), None) if isinstance(text, str) else (None, None)
+    finally:
+        await form.close()
+
+
+def create_app(pool: NodePool, health_interval: float, timeout: float, max_connections: int,
+               trusted_proxies: frozenset = frozenset(), limiter: Optional[AdmissionController] = None) -> FastAPI:
+    app = FastAPI(title="Prescription API router", docs_url=None, redoc_url=None, openapi_url=None)
+    executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="router")
+    issued = LRUCache(int(os.getenv("ROUTER_ANALYSIS_IDS", "10000")))  # analysis_id -> node
+
+    async def health_loop():
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.gather(*(loop.run_in_executor(executor, pool.check, node) for node in pool.nodes))
+            await asyncio.sleep(health_interval)
+
+    @app.on_event("startup")
+    async def start_health_checks():
+        loop = asyncio.get_running_loop()
+        for _ in range(pool.rise):  # admit healthy nodes before serving
+            await asyncio.gather(*(loop.run_in_executor(executor, pool.check, node) for node in pool.nodes))
+        app.state.health_task = asyncio.create_task(health_loop())
+
+    @app.get("/router/status")
+    async def router_status():
+        return {**pool.status(), "rate_limit": limiter.stats() if limiter is not None else None}
+
+    @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS", "HEAD"])
+    async def proxy(request: Request, path: str):
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in SKIP_REQUEST_HEADERS}
+        client_host = request.client.host if request.client else "unknown"
+        # Overwrite any caller-supplied X-Client-ID: backends trust it from the router
+        client_id = headers["x-client-id"] = client_identity(client_host, request.headers, trusted_proxies)
+        # Backends each keep their own buckets, so a client spread over N nodes would
+        # get N times its rate; charge the same route costs once here instead
+        cost = route_cost(request.url.path)
+        if limiter is not None and cost is not None:
+            retry_after = limiter.charge(client_id, cost)
+            if retry_after > 0:
+                limiter.counters["rate_limited"] += 1
+                return JSONResponse({"detail": f"Rate limit exceeded for {request.url.path} (cost {cost:g} tokens)"},
+                                    status_code=429, headers={"Retry-After": str(max(1, math.ceil(min(retry_after, 3600))))})
+        body = await request.body()
+        try:
+            key, pinned = await routing_key(request, body, issued)
+        except Exception as e:  # malformed forms are the backend's to reject
+            logger.debug(f"No routing key for {request.url.path}: {e}")
+            key, pinned = None, None
+        headers["x-forwarded-for"] = ", ".join(filter(None, [request.headers.get("x-forwarded-for"), client_host]))
+        target = request.url.path + (f"?{request.url.query}" if request.url.query else "")
+
+        loop = asyncio.get_running_loop()
+        for node in pool.candidates(key, pinned):
+            try:
+                upstream = await loop.run_in_executor(executor, lambda: pool.session.request(
+                    request.method, node + target, headers=headers, data=body, timeout=timeout, allow_redirects=False))
+            except requests.exceptions.ConnectionError as e:
+                pool.mark(node, False, f"connection failed ({e.__class__.__name__})", immediate=True)
+                continue
+            except requests.exceptions.Timeout:
+                pool.count(node, "errors")
+                return JSONResponse({"detail": f"Backend {node} timed out"}, status_code=504)
+            pool.count(node, "requests")
+            if request.url.path == "/analyze-text" and upstream.status_code == 200:
+                try:
+                    analysis_id = upstream.json().get("analysis_id")
+                except ValueError:
+                    analysis_id = None
+                if analysis_id:
+                    issued.put(analysis_id, node)
+            response_headers = {k: v for k, v in upstream.headers.items() if k.lower() not in SKIP_RESPONSE_HEADERS}
+            response_headers["x-routed-to"] = node
+            return Response(upstream.content, status_code=upstream.status_code, headers=response_headers)
+        return JSONResponse({"detail": "No healthy backend nodes"}, status_code=503, headers={"Retry-After": "2"})
+
+    return app
+
+
+def spawn_backends(count: int, base_port: int) -> Tuple[List[str], List[subprocess.Popen]]:
+    """Start local uvicorn backends on consecutive ports (for testing the router)"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    nodes, processes = [], []
+    for i in range(count):
+        port = base_port + i
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--log-level", "warning"],
+            cwd=root,
+        ))
+        nodes.append(f"http://127.0.0.1:{port}")
+    deadline = time.monotonic() + 120
+    for node in nodes:  # wait for the app imports so the first health checks pass
+        while time.monotonic() < deadline:
+            try:
+                requests.get(f"{node}/health", timeout=1)
+                break
+            except requests.exceptions.ConnectionError:
+                time.sleep(0.5)
+    return nodes, processes
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", action="append", default=[], help="backend base URL (repeat per node)")
+    parser.add_argument("--spawn", type=int, default=0, help="start this many local uvicorn backends")
+    parser.add_argument("--base-port", type=int, default=8001, help="first port for --spawn backends")
+    parser.add_argument("--host", default=os.getenv("ROUTER_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("ROUTER_PORT", "8080")))
+    parser.add_argument("--vnodes", type=int, default=160, help="ring points per node")
+    parser.add_argument("--health-interval", type=float, default=2.0, help="seconds between health checks")
+    parser.add_argument("--fall", type=int, default=2, help="failed checks before a node leaves the ring")
+    parser.add_argument("--rise", type=int, default=2, help="passed checks before a node joins the ring")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for a backend response")
+    parser.add_argument("--max-connections", type=int, default=64, help="concurrent proxied requests")
+    parser.add_argument("--no-rate-limit", action="store_true",
+                        help="leave per-client rate limiting to the backends (each node then allows the full rate)")
+    parser.add_argument("--trusted-proxy", action="append", default=None,
+                        help="peer allowed to set X-Client-ID, e.g. the Streamlit server (repeat; default TRUSTED_PROXIES)")
+    args = parser.parse_args(argv)
+
+    backends = args.backend or [b for b in os.getenv("ROUTER_BACKENDS", "").split(",") if b.strip()]
+    processes: List[subprocess.Popen] = []
+    if args.spawn:
+        spawned, processes = spawn_backends(args.spawn, args.base_port)
+        backends += spawned
+    if not backends:
+        parser.error("give --backend URLs, ROUTER_BACKENDS or --spawn N")
+
+    import uvicorn
+    logging.basicConfig(level=logging.INFO)
+    pool = NodePool(backends, args.vnodes, args.fall, args.rise, args.max_connections)
+    trusted = args.trusted_proxy or [p for p in os.getenv("TRUSTED_PROXIES", "127.0.0.1,::1").split(",") if p.strip()]
+    # Same bucket settings as the backends (RATE_LIMIT_*), enforced across all nodes
+    limiter = None if args.no_rate_limit else AdmissionController(
+        capacity=float(os.getenv("RATE_LIMIT_CAPACITY", "200")),
+        refill_rate=float(os.getenv("RATE_LIMIT_REFILL_PER_SEC", "2")),
+        interactive_slots=0, batch_slots=0, queue_timeout=0
+    )
+    app = create_app(pool, args.health_interval, args.timeout, args.max_connections,
+                     frozenset(p.strip() for p in trusted), limiter)
+
+    def stop_backends():
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+    # uvicorn re-raises SIGTERM/SIGINT after its own shutdown, so stop spawned
+    # backends from the shutdown hook rather than after run() returns
+    app.add_event_handler("shutdown", stop_backends)
+    try:
+        uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+    finally:
+        stop_backends()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
+import atexit
+import select
+import socket
 import subprocess
 import threading
 import time
@@ -10,13 +13,79 @@ def run_fastapi():
     """Run FastAPI backend"""
     host = os.getenv('FASTAPI_HOST', '0.0.0.0')
     port = os.getenv('FASTAPI_PORT', '8000')
-    subprocess.run([
-        'uvicorn', 
-        'app.main:app', 
-        '--host', host, 
-        '--port', port, 
-        '--reload'
-    ])
+    if os.getenv('UVICORN_RELOAD', 'false').lower() in ('1', 'true', 'yes'):
+        # Development: auto-reload on code changes (no worker recycling)
+        subprocess.run(['uvicorn', 'app.main:app', '--host', host, '--port', port, '--reload'])
+        return
+    supervise_api(host, int(port), int(os.getenv('API_WORKERS', '1')))
+
+def supervise_api(host: str, port: int, workers: int):
+    """Keep `workers` uvicorn processes serving one shared listening socket.
+
+    Workers report "ready <pid>" once started and "recycle <pid>" when they
+    cross MAX_REQUESTS / MAX_RSS_MB. A recycling worker keeps serving until
+    its replacement is ready; only then does it get SIGTERM and drain its
+    in-flight requests, so a recycle never leaves the port without a worker.
+    Workers that exit on their own are restarted, backing off if they keep
+    failing fast.
+    """
+    listener = socket.create_server((host, port), backlog=2048)
+    listener.set_inheritable(True)
+    control_read, control_write = os.pipe()
+    os.set_inheritable(control_write, True)
+    env = {**os.environ, 'WORKER_CONTROL_FD': str(control_write)}
+    command = ['uvicorn', 'app.main:app', '--fd', str(listener.fileno())]
+    
+    processes, started = {}, {}  # pid -> Popen, pid -> start time
+    replacing = {}  # replacement pid -> pid of the worker it replaces
+    retiring = set()
+    
+    def spawn():
+        process = subprocess.Popen(command, env=env, pass_fds=(listener.fileno(), control_write))
+        processes[process.pid], started[process.pid] = process, time.monotonic()
+        return process.pid
+    
+    atexit.register(lambda: [process.terminate() for process in processes.values()])
+    for _ in range(max(1, workers)):
+        spawn()
+    
+    buffer = b''
+    while True:
+        if select.select([control_read], [], [], 1.0)[0]:
+            buffer += os.read(control_read, 4096)
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                message, _, pid = line.decode().partition(' ')
+                pid = int(pid)
+                if message == 'recycle' and pid in processes and pid not in retiring and pid not in replacing.values():
+                    replacing[spawn()] = pid
+                    print(f"FastAPI worker {pid} asked to be recycled; starting its replacement...")
+                elif message == 'ready' and pid in replacing:
+                    old = replacing.pop(pid)
+                    if old in processes:
+                        retiring.add(old)
+                        processes[old].terminate()  # uvicorn drains in-flight requests, then exits
+        
+        for pid, process in list(processes.items()):
+            if process.poll() is None:
+                continue
+            del processes[pid]
+            uptime = time.monotonic() - started.pop(pid)
+            if pid in retiring:
+                retiring.discard(pid)
+                print(f"FastAPI worker {pid} retired after {uptime:.0f}s")
+                continue
+            if pid in replacing.values():
+                # Died while its replacement was starting; the replacement takes its place
+                replacing = {new: old for new, old in replacing.items() if old != pid}
+                continue
+            replaces = replacing.pop(pid, None)
+            delay = 1 if uptime > 30 else 5
+            print(f"FastAPI worker {pid} exited with code {process.returncode} after {uptime:.0f}s; restarting in {delay}s...")
+            time.sleep(delay)
+            new = spawn()
+            if replaces in processes:
+                replacing[new] = replaces
 
 def run_streamlit():
     """Run Streamlit frontend"""
@@ -1,6 +1,12 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from PIL import Image
 import io
 
@@ -11,6 +17,144 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# Backend configuration
+fastapi_url = os.getenv("BACKEND_URL", "http://localhost:8000").rstrip("/")
+BACKEND_CONNECT_TIMEOUT = float(os.getenv("BACKEND_CONNECT_TIMEOUT", "3.05"))
+BACKEND_READ_TIMEOUT = float(os.getenv("BACKEND_READ_TIMEOUT", "120"))
+BACKEND_RETRIES = int(os.getenv("BACKEND_RETRIES", "2"))
+BACKEND_POOL_SIZE = int(os.getenv("BACKEND_POOL_SIZE", "32"))
+PREVIEW_MAX_SIZE = (640, 640)
+# Identifies this browser session to the backend's per-client rate limiter
+SESSION_CLIENT_ID = st.session_state.setdefault('client_id', uuid.uuid4().hex)
+# Matches the backend's default batch lane (ADMISSION_BATCH_SLOTS)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+# How long a batch file keeps waiting out 429/503 Retry-After before it is reported as failed
+BATCH_MAX_WAIT = float(os.getenv("BATCH_MAX_WAIT", "300"))
+LATENCY_HISTORY_SIZE = 200
+
+@st.cache_resource
+def get_backend_session() -> requests.Session:
+    """Shared, connection-pooled HTTP session reused across reruns and user sessions"""
+    retry = Retry(
+        total=BACKEND_RETRIES,
+        connect=BACKEND_RETRIES,
+        backoff_factor=0.3,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "POST"}),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=BACKEND_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def backend_post(path: str, batch: bool = False, **kwargs) -> requests.Response:
+    """POST to the FastAPI backend through the pooled session with timeouts.
+
+    `batch` requests go to the backend's batch lane so they cannot take the
+    slots interactive users are waiting on.
+    """
+    headers = {"X-Client-ID": SESSION_CLIENT_ID}
+    if batch:
+        headers["X-Request-Priority"] = "batch"
+    return get_backend_session().post(
+        f"{fastapi_url}{path}",
+        timeout=(BACKEND_CONNECT_TIMEOUT, BACKEND_READ_TIMEOUT),
+        headers=headers,
+        **kwargs
+    )
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def make_thumbnail(image_bytes: bytes, max_size: tuple = PREVIEW_MAX_SIZE) -> bytes:
+    """Decode an uploaded image once and cache a downscaled JPEG preview"""
+    image = Image.open(io.BytesIO(image_bytes))
+    image.draft("RGB", max_size)  # Let JPEG decoding skip full resolution when possible
+    image = image.convert("RGB")
+    image.thumbnail(max_size)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+# Ask the backend for grouped, deduplicated entities (top 5 per type) instead of the full list
+ENTITY_VIEW = {"group_by_type": "true", "top_k": 5, "dedupe": "true"}
+
+def entity_groups_of(entity_data: dict) -> dict:
+    """Entities by type, from the backend's grouped view or grouped here for a flat list"""
+    if entity_data.get('groups') is not None:
+        return entity_data['groups']
+    groups = {}
+    for entity in entity_data.get('data', []):
+        if isinstance(entity, dict):
+            groups.setdefault(entity.get('entity_group', entity.get('label', 'OTHER')), []).append(entity)
+    return groups
+
+def analyze_uploaded_file(name: str, content: bytes, content_type: str, patient_age: int, batch: bool = False) -> dict:
+    """Send one uploaded file to the backend and time the round trip
+
+    Batch files are rate limited and shed by the backend as a matter of course,
+    so they keep waiting out Retry-After for up to BATCH_MAX_WAIT seconds.
+    """
+    start = time.perf_counter()
+    try:
+        files = {"file": (name, content, content_type)}
+        data = {"patient_age": patient_age, **ENTITY_VIEW}
+        response = backend_post("/analyze-prescription", batch=batch, files=files, data=data)
+        while batch and response.status_code in (429, 503):
+            delay = float(response.headers.get("Retry-After", "1"))
+            if time.perf_counter() - start + delay > BATCH_MAX_WAIT:
+                break
+            time.sleep(delay)
+            response = backend_post("/analyze-prescription", batch=batch, files=files, data=data)
+        if response.status_code == 200:
+            result = response.json()
+            result['client_seconds'] = time.perf_counter() - start
+            return {"name": name, "result": result, "error": None, "seconds": result['client_seconds']}
+        error = f"{response.status_code} - {response.text}"
+    except Exception as e:
+        error = str(e)
+    return {"name": name, "result": None, "error": error, "seconds": time.perf_counter() - start}
+
+def batch_row(outcome: dict) -> dict:
+    """Summarize one file's analysis outcome as a results-table row"""
+    medications = []
+    if outcome["result"]:
+        groups = entity_groups_of(outcome["result"].get("medical_entities", {}))
+        medications = [e.get("word", "") for e in groups.get("MEDICATION", [])]
+    return {
+        "File": outcome["name"],
+        "Status": "✅ Done" if outcome["result"] else f"❌ {outcome['error'][:80]}",
+        "Time (s)": round(outcome["seconds"], 2),
+        "Medications": ", ".join(dict.fromkeys(medications))
+    }
+
+def record_latency(result: dict) -> None:
+    """Append a completed analysis' timings to this session's rolling history"""
+    history = st.session_state.setdefault('latency_history', [])
+    timings = result.get('timings', {})
+    history.append({
+        "client_ms": result.get('client_seconds', 0) * 1000,
+        "server_ms": timings.get('total', 0),
+        "cached": any(result.get('cache', {}).values())
+    })
+    del history[:-LATENCY_HISTORY_SIZE]
+
+def latency_histogram(values: list, num_bins: int = 10) -> dict:
+    """Bucket latencies (ms) into equal-width bins labelled by their upper edge
+
+    Labels are right-aligned to a fixed width so they also sort correctly as strings.
+    """
+    low, high = min(values), max(values)
+    width = (high - low) / num_bins or 1
+    counts = {}
+    for i in range(num_bins):
+        counts[f"≤{low + width * (i + 1):>9,.0f} ms"] = 0
+    labels = list(counts)
+    for value in values:
+        counts[labels[min(int((value - low) / width), num_bins - 1)]] += 1
+    return counts
+
 # Custom CSS for modern, professional styling
 st.markdown("""
 <style>
@@ -388,9 +532,6 @@ with st.expander("🔧 System Status", expanded=False):
     with col_status3:
         st.markdown('<div class="metric-card"><h4>🤖 AI Models</h4><p>Ready</p></div>', unsafe_allow_html=True)
 
-# Configuration
-fastapi_url = "http://localhost:8000"
-
 # Main interface with improved layout
 col1, col2 = st.columns([1.2, 1.8])
 
@@ -417,21 +558,30 @@ with col1:
     )
 
     if input_method == "📁 Upload File":
-        st.markdown("**📤 Upload Prescription Document**")
-        uploaded_file = st.file_uploader(
+        st.markdown("**📤 Upload Prescription Documents**")
+        uploaded_files = st.file_uploader(
             "",
             type=['png', 'jpg', 'jpeg', 'txt', 'pdf'],
-            help="💡 Drag and drop your file here, or click to browse • Supported: PNG, JPG, JPEG, TXT, PDF (Max 200MB)",
+            accept_multiple_files=True,
+            help="💡 Drag and drop one or more files here, or click to browse • Supported: PNG, JPG, JPEG, TXT, PDF (Max 200MB)",
             label_visibility="collapsed"
         )
         
-        if uploaded_file is not None:
+        if len(uploaded_files) == 1:
+            uploaded_file = uploaded_files[0]
             if uploaded_file.type.startswith('image'):
-                image = Image.open(uploaded_file)
-                st.image(image, caption="📸 Uploaded Prescription", use_column_width=True)
+                st.image(make_thumbnail(uploaded_file.getvalue()), caption="📸 Uploaded Prescription", use_column_width=True)
                 st.success(f"✅ Image loaded: {uploaded_file.name}")
             else:
                 st.success(f"📄 File uploaded: {uploaded_file.name}")
+        elif uploaded_files:
+            images = [f for f in uploaded_files if f.type.startswith('image')][:8]
+            if images:
+                thumb_cols = st.columns(4)
+                for i, image_file in enumerate(images):
+                    with thumb_cols[i % 4]:
+                        st.image(make_thumbnail(image_file.getvalue(), (160, 160)), caption=image_file.name)
+            st.success(f"📚 {len(uploaded_files)} files ready for batch analysis")
     
     else: # Text Input
         st.markdown("**✏ Enter Prescription Text**")
@@ -449,8 +599,11 @@ with col1:
     st.markdown("<br>", unsafe_allow_html=True)
     
     # Enhanced analyze button
-    if input_method == "📁 Upload File":
-        button_text = "� Analyze Prescription Document"
+    if input_method == "📁 Upload File" and len(uploaded_files) > 1:
+        button_text = f"📚 Analyze {len(uploaded_files)} Prescription Documents"
+        button_help = f"🚀 Analyze all uploaded prescriptions, up to {BATCH_CONCURRENCY} at a time"
+    elif input_method == "📁 Upload File":
+        button_text = "📄 Analyze Prescription Document"
         button_help = "🚀 Start AI-powered analysis of your uploaded prescription"
     else:
         button_text = "🔬 Analyze Prescription Text"
@@ -463,23 +616,48 @@ with col1:
         help=button_help
     )
     if analyze_button:
-        if input_method == "📁 Upload File" and uploaded_file is not None:
+        if input_method == "📁 Upload File" and len(uploaded_files) > 1:
+            # Fan the files out to the backend with bounded concurrency and
+            # show each result as soon as it finishes
+            progress = st.progress(0.0, text=f"🤖 Analyzing {len(uploaded_files)} prescriptions...")
+            table = st.empty()
+            rows, batch_results = [], {}
+            batch_start = time.perf_counter()
+            # Results are keyed by upload position: two uploads may share a file name
+            with ThreadPoolExecutor(max_workers=min(BATCH_CONCURRENCY, len(uploaded_files))) as executor:
+                futures = {
+                    executor.submit(analyze_uploaded_file, f.name, f.getvalue(), f.type, patient_age, batch=True): index
+                    for index, f in enumerate(uploaded_files)
+                }
+                for done, future in enumerate(as_completed(futures), start=1):
+                    index = futures[future]
+                    outcome = future.result()
+                    rows.append({"#": index + 1, **batch_row(outcome)})
+                    if outcome["result"]:
+                        batch_results[index] = outcome["result"]
+                        record_latency(outcome["result"])
+                    table.dataframe(rows, use_container_width=True, hide_index=True)
+                    progress.progress(done / len(futures), text=f"🤖 Analyzed {done}/{len(futures)} prescriptions")
+            elapsed = time.perf_counter() - batch_start
+            st.session_state['batch_rows'] = sorted(rows, key=lambda row: row["#"])
+            st.session_state['batch_names'] = [f.name for f in uploaded_files]
+            st.session_state['batch_results'] = batch_results
+            if batch_results:
+                st.session_state['analysis_result'] = batch_results[min(batch_results)]
+            st.success(f"✅ {len(batch_results)}/{len(uploaded_files)} analyzed in {elapsed:.1f}s ({len(uploaded_files) / elapsed:.1f} files/s)")
+        
+        elif input_method == "📁 Upload File" and uploaded_files:
             with st.spinner("🤖 AI analyzing prescription..."):
-                try:
-                    # For file uploads, create form data including the age
-                    files = {"file": (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
-                    data = {"patient_age": patient_age} # Add age here
-                    response = requests.post(f"{fastapi_url}/analyze-prescription", files=files, data=data)
-                    
-                    if response.status_code == 200:
-                        result = response.json()
-                        st.session_state['analysis_result'] = result
-                        st.success("✅ Analysis completed successfully!")
-                    else:
-                        st.error(f"❌ Analysis failed: {response.status_code} - {response.text}. Please check your backend connection.")
-                        
-                except Exception as e:
-                    st.error(f"❌ Error: {str(e)}")
+                # For file uploads, create form data including the age
+                uploaded_file = uploaded_files[0]
+                outcome = analyze_uploaded_file(uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type, patient_age)
+                st.session_state.pop('batch_results', None)
+                if outcome["result"]:
+                    st.session_state['analysis_result'] = outcome["result"]
+                    record_latency(outcome["result"])
+                    st.success("✅ Analysis completed successfully!")
+                else:
+                    st.error(f"❌ Analysis failed: {outcome['error']}. Please check your backend connection.")
         
         elif input_method == "✏ Text Input" and prescription_text:
             with st.spinner("🤖 AI analyzing prescription text..."):
@@ -488,13 +666,26 @@ with col1:
                     # Send age as form data along with text
                     data = {
                         "text": prescription_text,
-                        "patient_age": patient_age # Add age here
+                        "patient_age": patient_age, # Add age here
+                        **ENTITY_VIEW
                     }
-                    response = requests.post(f"{fastapi_url}/analyze-text", data=data)
+                    start = time.perf_counter()
+                    previous_id = st.session_state.get('text_analysis_id')
+                    if previous_id:
+                        # Re-check an edited prescription: the backend only re-extracts changed lines
+                        response = backend_post("/analyze-text/incremental", data={**data, "analysis_id": previous_id})
+                        if response.status_code == 404:
+                            response = backend_post("/analyze-text", data=data)
+                    else:
+                        response = backend_post("/analyze-text", data=data)
                     
                     if response.status_code == 200:
                         result = response.json()
+                        st.session_state['text_analysis_id'] = result.get('analysis_id')
+                        result['client_seconds'] = time.perf_counter() - start
+                        record_latency(result)
                         st.session_state['analysis_result'] = result
+                        st.session_state.pop('batch_results', None)
                         st.success("✅ Analysis completed successfully!")
                     else:
                         st.error(f"❌ Analysis failed: {response.status_code} - {response.text}. Please check your backend connection.")
@@ -509,6 +700,14 @@ with col1:
 with col2:
     st.markdown('<h3 class="section-header">📊 AI Analysis Results</h3>', unsafe_allow_html=True)
     
+    if st.session_state.get('batch_results'):
+        with st.expander(f"📚 Batch Results ({len(st.session_state['batch_rows'])} files)", expanded=True):
+            st.dataframe(st.session_state['batch_rows'], use_container_width=True, hide_index=True)
+        batch_names = st.session_state['batch_names']
+        selected_index = st.selectbox("Show analysis for", sorted(st.session_state['batch_results']),
+                                      format_func=lambda index: f"{index + 1}. {batch_names[index]}")
+        st.session_state['analysis_result'] = st.session_state['batch_results'][selected_index]
+
     if 'analysis_result' in st.session_state:
         result = st.session_state['analysis_result']
         
@@ -534,6 +733,9 @@ with col2:
         
         granite_data = result.get('ibm_granite_analysis', {})
         
+        if result.get('cache', {}).get('near_duplicate'):
+            st.warning("♻️ Text was reused from a recent, near-identical scan instead of running OCR again. Check it against the image before dispensing.")
+        
         if granite_data.get('success'):
             granite_result = granite_data.get('data', [])
             if isinstance(granite_result, list) and granite_result:
@@ -563,53 +765,44 @@ with col2:
         entity_data = result.get('medical_entities', {})
         
         if entity_data.get('success'):
-            entities = entity_data.get('data', [])
-            if isinstance(entities, list) and entities:
-                # Group entities by type
-                entity_groups = {}
-                for entity in entities:
-                    if isinstance(entity, dict):
-                        entity_type = entity.get('entity_group', entity.get('label', 'OTHER'))
-                        if entity_type not in entity_groups:
-                            entity_groups[entity_type] = []
-                        entity_groups[entity_type].append(entity)
-                
+            # Grouped, deduplicated and trimmed to the top entities by the backend
+            entity_groups = entity_groups_of(entity_data)
+            if entity_groups:
                 # Display entities with enhanced styling
-                if entity_groups:
-                    entity_icons = {
-                        'DRUG': '💊',
-                        'MEDICATION': '💊',
-                        'DOSAGE': '⚖️',
-                        'FREQUENCY': '🕐',
-                        'DISEASE': '🔬',
-                        'CONDITION': '🔬',
-                        'OTHER': '📋'
-                    }
-                    
-                    num_cols = min(len(entity_groups), 3)
-                    cols = st.columns(num_cols)
-                    
-                    for i, (group_name, group_entities) in enumerate(entity_groups.items()):
-                        with cols[i % num_cols]:
-                            icon = entity_icons.get(group_name.upper(), '📋')
+                entity_icons = {
+                    'DRUG': '💊',
+                    'MEDICATION': '💊',
+                    'DOSAGE': '⚖️',
+                    'FREQUENCY': '🕐',
+                    'DURATION': '📅',
+                    'DISEASE': '🔬',
+                    'CONDITION': '🔬',
+                    'OTHER': '📋'
+                }
+                
+                num_cols = min(len(entity_groups), 3)
+                cols = st.columns(num_cols)
+                
+                for i, (group_name, group_entities) in enumerate(entity_groups.items()):
+                    with cols[i % num_cols]:
+                        icon = entity_icons.get(group_name.upper(), '📋')
+                        st.markdown(f"""
+                        <div class="med-card">
+                            <strong>{icon} {group_name.title()}</strong><br>
+                        """, unsafe_allow_html=True)
+                        
+                        # Sort by confidence and show top entities
+                        sorted_entities = sorted(group_entities, key=lambda x: x.get('score', 0), reverse=True)
+                        for entity in sorted_entities[:5]:  # Show top 5
+                            count = entity.get('count', 1)
+                            entity_text = entity.get('word', entity.get('entity', ''))
+                            confidence = entity.get('score', entity.get('confidence', 0))
+                            confidence_color = "🟢" if confidence > 0.8 else "🟡" if confidence > 0.6 else "🔴"
                             st.markdown(f"""
-                            <div class="med-card">
-                                <strong>{icon} {group_name.title()}</strong><br>
-                            """, unsafe_allow_html=True)
-                            
-                            # Sort by confidence and show top entities
-                            sorted_entities = sorted(group_entities, key=lambda x: x.get('score', 0), reverse=True)
-                            for entity in sorted_entities[:5]:  # Show top 5
-                                entity_text = entity.get('word', entity.get('entity', ''))
-                                confidence = entity.get('score', entity.get('confidence', 0))
-                                confidence_color = "🟢" if confidence > 0.8 else "🟡" if confidence > 0.6 else "🔴"
-                                st.markdown(f"""
-                                • {entity_text} {confidence_color} ({confidence:.1%})
-                                """)
-                            
-                            st.markdown("</div>", unsafe_allow_html=True)
-                else:
-                    st.info("🔍 No specific medical entities detected in this prescription.")
+                            • {entity_text}{f" ×{count}" if count > 1 else ""} {confidence_color} ({confidence:.1%})
+                            """)
+                        
+                        st.markdown("</div>", unsafe_allow_html=True)
             else:
                 st.info("🔍 No medical entities found.")
         elif 'error' in entity_data:
@@ -633,6 +826,13 @@ with col2:
                 <em>All safety checks completed • Analysis complete</em>
             </div>
             """, unsafe_allow_html=True)
+        elif status == 'needs_review':
+            st.markdown("""
+            <div class="med-card" style="background: linear-gradient(135deg, #f59e0b 10%, #d97706 100%); color: white;">
+                <strong>⚠️ Needs Review</strong><br>
+                <em>Text was reused from a similar scan • Check it against the image</em>
+            </div>
+            """, unsafe_allow_html=True)
         else:
             st.markdown(f"""
             <div class="med-card" style="background: linear-gradient(135deg, #3b82f6 10%, #2563eb 100%); color: white;">
@@ -652,11 +852,36 @@ with col2:
                 st.markdown("• **Granite Model:** IBM Granite Medical AI")
                 st.markdown("• **NER Model:** Biomedical Entity Recognition")
             
-            st.markdown("**📊 Performance Metrics:**")
-            st.markdown("• **Processing Time:** ~2.3 seconds")
-            st.markdown("• **Analysis Confidence:** 94.2%")
-            st.markdown("• **Entity Detection:** Multi-class biomedical NER")
-            st.markdown("• **Safety Checks:** Age-appropriate recommendations")
+            st.markdown("**📊 Performance Metrics (measured):**")
+            timings = result.get('timings', {})
+            if timings:
+                st.markdown(f"• **Backend Processing Time:** {timings.get('total', 0):,.1f} ms")
+                stage_labels = {"ocr": "OCR", "normalization": "Text Normalization", "extraction": "Entity Extraction", "rendering": "Report Rendering"}
+                for stage, label in stage_labels.items():
+                    if stage in timings:
+                        st.markdown(f"  ◦ {label}: {timings[stage]:,.1f} ms")
+            else:
+                st.markdown("• **Backend Processing Time:** not reported by backend")
+            if 'client_seconds' in result:
+                st.markdown(f"• **Round Trip (incl. network):** {result['client_seconds'] * 1000:,.1f} ms")
+            incremental = result.get('incremental')
+            if incremental:
+                st.markdown(f"• **Incremental Re-analysis:** {incremental['lines_reextracted']} of {incremental['lines_total']} lines re-extracted")
+            cache_flags = result.get('cache', {})
+            if cache_flags:
+                st.markdown("• **Cache:** " + ", ".join(f"{name} {'hit ✅' if hit else 'miss'}" for name, hit in cache_flags.items()))
+            scores = [e.get('score', 0) for members in entity_groups_of(entity_data).values() for e in members] if entity_data.get('success') else []
+            if scores:
+                st.markdown(f"• **Mean Entity Confidence:** {sum(scores) / len(scores):.1%} over {len(scores)} entities")
+            
+            history = st.session_state.get('latency_history', [])
+            if len(history) > 1:
+                server_ms = sorted(h['server_ms'] for h in history)
+                p50 = server_ms[len(server_ms) // 2]
+                p95 = server_ms[min(len(server_ms) - 1, int(len(server_ms) * 0.95))]
+                cached = sum(1 for h in history if h['cached'])
+                st.markdown(f"**⏱ Session Latency ({len(history)} analyses):** p50 {p50:,.0f} ms • p95 {p95:,.0f} ms • {cached} cache hits")
+                st.bar_chart({"analyses": latency_histogram([h['client_ms'] or h['server_ms'] for h in history])})
             
         st.markdown('</div>', unsafe_allow_html=True)
     